@@ -0,0 +1,195 @@
+"""
+Microbenchmark: generic per-attribute loop (before) vs compiled RowEncoder (after).
+
+Usage: python benchmarks/encoder.py [ROWS]
+
+For every text converter from `ru_address.dump.ConverterRegistry` reports rows/sec for
+- `encode`: row encoding alone over pre-parsed elements;
+- `dump`: whole `Data.convert_and_dump` pass (XML parsing included),
+and checks that both variants produce byte-identical output.
+`typed` is RowEncoder with XSD field types (RA_TYPED_VALUES), reported with its output size.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import lxml.etree as et
+from ru_address.dump import BaseDumpConverter, ConverterRegistry
+from ru_address.encoder import RowEncoder
+from ru_address.source.xml import Data, Definition
+
+SCHEMA = '''<?xml version="1.0" encoding="utf-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" elementFormDefault="qualified">
+  <xs:element name="HOUSES">
+    <xs:complexType>
+      <xs:sequence>
+        <xs:element name="HOUSE" maxOccurs="unbounded">
+          <xs:complexType>
+            <xs:attribute name="ID" type="xs:long" use="required"/>
+            <xs:attribute name="OBJECTID" type="xs:long" use="required"/>
+            <xs:attribute name="OBJECTGUID" type="xs:string" use="required"/>
+            <xs:attribute name="CHANGEID" type="xs:long" use="required"/>
+            <xs:attribute name="HOUSENUM" type="xs:string"/>
+            <xs:attribute name="ADDNUM1" type="xs:string"/>
+            <xs:attribute name="HOUSETYPE" type="xs:integer"/>
+            <xs:attribute name="OPERTYPEID" type="xs:integer" use="required"/>
+            <xs:attribute name="PREVID" type="xs:long"/>
+            <xs:attribute name="UPDATEDATE" type="xs:date" use="required"/>
+            <xs:attribute name="STARTDATE" type="xs:date" use="required"/>
+            <xs:attribute name="ENDDATE" type="xs:date" use="required"/>
+            <xs:attribute name="ISACTUAL" type="xs:boolean" use="required"/>
+            <xs:attribute name="ISACTIVE" type="xs:boolean" use="required"/>
+          </xs:complexType>
+        </xs:element>
+      </xs:sequence>
+    </xs:complexType>
+  </xs:element>
+</xs:schema>
+'''
+
+NUMBERS = ['1', '12&quot;А&quot;', '7\\2', "15'Б", '3&#9;к1', '128']
+
+
+class NullSink:
+    def write(self, data):
+        pass
+
+
+class CollectSink:
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+
+
+def generate(directory, rows):
+    schema_file = os.path.join(directory, 'AS_HOUSES_2_251_01_04_01_01.xsd')
+    with open(schema_file, 'w', encoding='utf-8') as f:
+        f.write(SCHEMA)
+    data_file = os.path.join(directory, 'AS_HOUSES_20230101_bench.XML')
+    with open(data_file, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?><HOUSES>')
+        for i in range(rows):
+            optional = f' ADDNUM1="{i % 9}" PREVID="{i * 3}"' if i % 3 else ''
+            f.write(f'<HOUSE ID="{i}" OBJECTID="{i * 7}" OBJECTGUID="2b1a4b4e-9d3c-4c1e-8d2f-{i:012d}" '
+                    f'CHANGEID="{i * 11}" HOUSENUM="{NUMBERS[i % len(NUMBERS)]}" HOUSETYPE="2" '
+                    f'OPERTYPEID="10"{optional} UPDATEDATE="2019-07-10" STARTDATE="2019-07-10" '
+                    f'ENDDATE="2079-06-06" ISACTUAL="{"true" if i % 4 else "false"}" ISACTIVE="true" />')
+        f.write('</HOUSES>')
+    return schema_file, data_file
+
+
+def legacy_encode(elem, table_fields, representation):
+    """ Тело цикла `Data.convert_and_dump` до появления RowEncoder """
+    value_query_parts = []
+    for field in table_fields:
+        value = representation.null_repr
+        if elem.get(field) is not None:
+            value = elem.get(field)
+            if value == "false":
+                value = representation.bool_repr[0]
+            elif value == "true":
+                value = representation.bool_repr[1]
+            else:
+                if representation.escape is not None:
+                    value = value.translate(representation.escape)
+                value = f'{representation.quotes}{value}{representation.quotes}'
+        value_query_parts.append(value)
+    value_query = representation.delimiter.join(value_query_parts)
+    return (f'{representation.row_indent}{representation.row_parentheses[0]}'
+            f'{value_query}{representation.row_parentheses[1]}')
+
+
+def legacy_convert_and_dump(data, dump_file, definition, bulk_size):
+    representation = data.table_representation
+    table_fields = definition.get_table_fields()
+    if representation.table_start_handler:
+        dump_file.write(representation.table_start_handler(data.table_name, table_fields))
+    current_row = 0
+    for _, elem in et.iterparse(data.data_source, events=('end',), tag=definition.get_entity_tag()):
+        content = []
+        until_new_bulk = current_row % bulk_size
+        if current_row != 0:
+            content.append(representation.line_ending_last if until_new_bulk == 0 else representation.line_ending)
+        if (current_row == 0 or until_new_bulk == 0) and representation.batch_start_handler:
+            content.append(representation.batch_start_handler(data.table_name, table_fields))
+        content.append(legacy_encode(elem, table_fields, representation))
+        current_row += 1
+        dump_file.write(''.join(content))
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    if current_row != 0:
+        dump_file.write(representation.line_ending_last)
+    if representation.table_end_handler:
+        dump_file.write(representation.table_end_handler(data.table_name))
+
+
+def measure(fn, rows):
+    start = time.perf_counter()
+    fn()
+    return rows / (time.perf_counter() - start)
+
+
+def main(rows):
+    with tempfile.TemporaryDirectory() as directory:
+        schema_file, data_file = generate(directory, rows)
+        definition = Definition('HOUSES', schema_file)
+        table_fields = definition.get_table_fields()
+        elements = [elem for _, elem in et.iterparse(data_file, events=('end',), tag=definition.get_entity_tag())]
+
+        print(f'{rows} rows, {len(table_fields)} columns')
+        print(f'{"target":<8}{"encode before":>16}{"encode after":>16}{"encode typed":>16}'
+              f'{"dump before":>16}{"dump after":>16}{"size typed":>12}')
+        for alias, converter in ConverterRegistry.get_available_platforms().items():
+            if converter.convert_table is not BaseDumpConverter.convert_table or \
+                    converter.get_data is not BaseDumpConverter.get_data:
+                continue  # Бинарные форматы не проходят через TableRepresentation
+            representation = converter.get_representation()
+            encode = RowEncoder(table_fields, representation).encode
+            encode_typed = RowEncoder(table_fields, representation, definition.get_field_types()).encode
+
+            def encode_before():
+                for elem in elements:
+                    legacy_encode(elem, table_fields, representation)  # pylint: disable=cell-var-from-loop
+
+            def encode_after():
+                for elem in elements:
+                    encode(elem.get)  # pylint: disable=cell-var-from-loop
+
+            def encode_after_typed():
+                for elem in elements:
+                    encode_typed(elem.get)  # pylint: disable=cell-var-from-loop
+
+            size = sum(len(encode(elem.get)) for elem in elements)
+            size_typed = sum(len(encode_typed(elem.get)) for elem in elements)
+
+            data = Data('HOUSES', data_file, representation, progress_handler=lambda _: None)
+            before, after = CollectSink(), CollectSink()
+            legacy_convert_and_dump(data, before, definition, 500)
+            data.convert_and_dump(after, definition, 500)
+            if ''.join(before.parts) != ''.join(after.parts):
+                raise AssertionError(f'Output mismatch for `{alias}`')
+
+            def dump_before(data=data):
+                legacy_convert_and_dump(data, NullSink(), definition, 500)
+
+            def dump_after(data=data):
+                data.convert_and_dump(NullSink(), definition, 500)
+
+            print(f'{alias:<8}'
+                  f'{measure(encode_before, rows):>16,.0f}'
+                  f'{measure(encode_after, rows):>16,.0f}'
+                  f'{measure(encode_after_typed, rows):>16,.0f}'
+                  f'{measure(dump_before, rows):>16,.0f}'
+                  f'{measure(dump_after, rows):>16,.0f}'
+                  f'{size_typed / size:>12.1%}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
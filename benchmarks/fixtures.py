@@ -0,0 +1,425 @@
+"""
+Synthetic GAR (ГАР ФИАС) fixture: XSD schemas and XML data laid out like the official export.
+
+Usage: python benchmarks/fixtures.py OUTPUT [--rows N] [--regions N] [--seed N] [--zip]
+
+- schemas `AS_{ENTITY}_2_251_01_04_01_01.xsd` and common tables `AS_{TABLE}_{DATE}_{GUID}.XML` in OUTPUT,
+  region tables in OUTPUT/01, OUTPUT/02 ...;
+- ~N rows per region table (scaled per table: PARAM tables are larger, divisions smaller);
+- values with XML entities (`&quot;`, `&amp;`, `&lt;`, `&#9;`, `&#10;`), apostrophes and backslashes,
+  optional attributes omitted (NULL) in about 30% of records;
+- consistent links: IDs and OBJECTIDs are unique across regions, every house, stead and apartment hangs
+  off a street -> city -> region chain of ADDR_OBJ records in MUN_HIERARCHY and ADM_HIERARCHY
+  (one actual record per object; streets and houses are always actual), PARAMS, divisions and history
+  refer to existing objects, type columns to the common type tables (FULL_ADDRESS resolves every address);
+- `--zip` additionally packs the tree into `gar_xml.zip` and `gar_schemas.zip` next to OUTPUT.
+Output is deterministic for the same arguments. `fixture.json` in OUTPUT lists row counts and sizes.
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import sys
+import uuid
+import zipfile
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from ru_address.core import Core
+
+DATE = '20230101'
+SCHEMA_VERSION = '2_251_01_04_01_01'
+
+LONG = ('long', 19)
+INTEGER = ('integer', 10)
+DATE_FIELD = ('date',)
+BOOLEAN = ('boolean',)
+FLAG = ('flag',)  # xs:integer 0/1, как ISACTUAL/ISACTIVE в реальных схемах
+
+
+def string(length):
+    return 'string', length
+
+
+# Сущность: (корневой элемент, элемент записи, [(атрибут, тип, обязательный)])
+ENTITIES = {
+    'ADDR_OBJ': ('ADDRESSOBJECTS', 'OBJECT', [
+        ('ID', LONG, True), ('OBJECTID', LONG, True), ('OBJECTGUID', string(36), True), ('CHANGEID', LONG, True),
+        ('NAME', string(250), True), ('TYPENAME', string(50), True), ('LEVEL', string(10), True),
+        ('OPERTYPEID', INTEGER, True), ('PREVID', LONG, False), ('NEXTID', LONG, False),
+        ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True), ('ENDDATE', DATE_FIELD, True),
+        ('ISACTUAL', FLAG, True), ('ISACTIVE', FLAG, True)]),
+    'ADDR_OBJ_DIVISION': ('ITEMS', 'ITEM', [
+        ('ID', LONG, True), ('PARENTID', LONG, True), ('CHILDID', LONG, True), ('CHANGEID', LONG, True)]),
+    'ADDR_OBJ_TYPES': ('ADDRESSOBJECTTYPES', 'ADDRESSOBJECTTYPE', [
+        ('ID', INTEGER, True), ('LEVEL', INTEGER, True), ('SHORTNAME', string(50), True),
+        ('NAME', string(250), True), ('DESC', string(250), False), ('UPDATEDATE', DATE_FIELD, True),
+        ('STARTDATE', DATE_FIELD, True), ('ENDDATE', DATE_FIELD, True), ('ISACTIVE', BOOLEAN, True)]),
+    'ADM_HIERARCHY': ('ITEMS', 'ITEM', [
+        ('ID', LONG, True), ('OBJECTID', LONG, True), ('PARENTOBJID', LONG, False), ('CHANGEID', LONG, True),
+        ('REGIONCODE', string(4), False), ('AREACODE', string(4), False), ('CITYCODE', string(4), False),
+        ('PLACECODE', string(4), False), ('PLANCODE', string(4), False), ('STREETCODE', string(4), False),
+        ('PREVID', LONG, False), ('NEXTID', LONG, False), ('UPDATEDATE', DATE_FIELD, True),
+        ('STARTDATE', DATE_FIELD, True), ('ENDDATE', DATE_FIELD, True), ('ISACTIVE', FLAG, True),
+        ('PATH', string(2000), True)]),
+    'APARTMENT_TYPES': ('APARTMENTTYPES', 'APARTMENTTYPE', [
+        ('ID', INTEGER, True), ('NAME', string(50), True), ('SHORTNAME', string(50), False),
+        ('DESC', string(250), False), ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True),
+        ('ENDDATE', DATE_FIELD, True), ('ISACTIVE', BOOLEAN, True)]),
+    'APARTMENTS': ('APARTMENTS', 'APARTMENT', [
+        ('ID', LONG, True), ('OBJECTID', LONG, True), ('OBJECTGUID', string(36), True), ('CHANGEID', LONG, True),
+        ('NUMBER', string(50), True), ('APARTTYPE', INTEGER, True), ('OPERTYPEID', LONG, True),
+        ('PREVID', LONG, False), ('NEXTID', LONG, False), ('UPDATEDATE', DATE_FIELD, True),
+        ('STARTDATE', DATE_FIELD, True), ('ENDDATE', DATE_FIELD, True), ('ISACTUAL', FLAG, True),
+        ('ISACTIVE', FLAG, True)]),
+    'CARPLACES': ('CARPLACES', 'CARPLACE', [
+        ('ID', LONG, True), ('OBJECTID', LONG, True), ('OBJECTGUID', string(36), True), ('CHANGEID', LONG, True),
+        ('NUMBER', string(50), True), ('OPERTYPEID', INTEGER, True), ('PREVID', LONG, False),
+        ('NEXTID', LONG, False), ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True),
+        ('ENDDATE', DATE_FIELD, True), ('ISACTUAL', FLAG, True), ('ISACTIVE', FLAG, True)]),
+    'CHANGE_HISTORY': ('ITEMS', 'ITEM', [
+        ('CHANGEID', LONG, True), ('OBJECTID', LONG, True), ('ADROBJECTID', string(36), True),
+        ('OPERTYPEID', INTEGER, True), ('NDOCID', LONG, False), ('CHANGEDATE', DATE_FIELD, True)]),
+    'HOUSE_TYPES': ('HOUSETYPES', 'HOUSETYPE', [
+        ('ID', INTEGER, True), ('NAME', string(50), True), ('SHORTNAME', string(50), False),
+        ('DESC', string(250), False), ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True),
+        ('ENDDATE', DATE_FIELD, True), ('ISACTIVE', BOOLEAN, True)]),
+    'HOUSES': ('HOUSES', 'HOUSE', [
+        ('ID', LONG, True), ('OBJECTID', LONG, True), ('OBJECTGUID', string(36), True), ('CHANGEID', LONG, True),
+        ('HOUSENUM', string(50), False), ('ADDNUM1', string(50), False), ('ADDNUM2', string(50), False),
+        ('HOUSETYPE', INTEGER, False), ('ADDTYPE1', INTEGER, False), ('ADDTYPE2', INTEGER, False),
+        ('OPERTYPEID', INTEGER, True), ('PREVID', LONG, False), ('NEXTID', LONG, False),
+        ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True), ('ENDDATE', DATE_FIELD, True),
+        ('ISACTUAL', FLAG, True), ('ISACTIVE', FLAG, True)]),
+    'MUN_HIERARCHY': ('ITEMS', 'ITEM', [
+        ('ID', LONG, True), ('OBJECTID', LONG, True), ('PARENTOBJID', LONG, False), ('CHANGEID', LONG, True),
+        ('OKTMO', string(11), False), ('PREVID', LONG, False), ('NEXTID', LONG, False),
+        ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True), ('ENDDATE', DATE_FIELD, True),
+        ('ISACTIVE', FLAG, True), ('PATH', string(2000), True)]),
+    'NORMATIVE_DOCS': ('NORMDOCS', 'NORMDOC', [
+        ('ID', LONG, True), ('NAME', string(8000), True), ('DATE', DATE_FIELD, True), ('NUMBER', string(150), True),
+        ('TYPE', INTEGER, True), ('KIND', INTEGER, True), ('UPDATEDATE', DATE_FIELD, True),
+        ('ORGNAME', string(255), False), ('REGNUM', string(100), False), ('REGDATE', DATE_FIELD, False),
+        ('ACCDATE', DATE_FIELD, False), ('COMMENT', string(8000), False)]),
+    'NORMATIVE_DOCS_KINDS': ('NDOCKINDS', 'NDOCKIND', [('ID', INTEGER, True), ('NAME', string(500), True)]),
+    'NORMATIVE_DOCS_TYPES': ('NDOCTYPES', 'NDOCTYPE', [
+        ('ID', INTEGER, True), ('NAME', string(500), True), ('STARTDATE', DATE_FIELD, True),
+        ('ENDDATE', DATE_FIELD, True)]),
+    'OBJECT_LEVELS': ('OBJECTLEVELS', 'OBJECTLEVEL', [
+        ('LEVEL', INTEGER, True), ('NAME', string(250), True), ('SHORTNAME', string(50), False),
+        ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True), ('ENDDATE', DATE_FIELD, True),
+        ('ISACTIVE', BOOLEAN, True)]),
+    'OPERATION_TYPES': ('OPERATIONTYPES', 'OPERATIONTYPE', [
+        ('ID', INTEGER, True), ('NAME', string(100), True), ('SHORTNAME', string(100), False),
+        ('DESC', string(250), False), ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True),
+        ('ENDDATE', DATE_FIELD, True), ('ISACTIVE', BOOLEAN, True)]),
+    'PARAM': ('PARAMS', 'PARAM', [
+        ('ID', LONG, True), ('OBJECTID', LONG, True), ('CHANGEID', LONG, False), ('CHANGEIDEND', LONG, True),
+        ('TYPEID', INTEGER, True), ('VALUE', string(8000), True), ('UPDATEDATE', DATE_FIELD, True),
+        ('STARTDATE', DATE_FIELD, True), ('ENDDATE', DATE_FIELD, True)]),
+    'PARAM_TYPES': ('PARAMTYPES', 'PARAMTYPE', [
+        ('ID', INTEGER, True), ('NAME', string(50), True), ('CODE', string(50), True), ('DESC', string(120), False),
+        ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True), ('ENDDATE', DATE_FIELD, True),
+        ('ISACTIVE', BOOLEAN, True)]),
+    'REESTR_OBJECTS': ('REESTR_OBJECTS', 'OBJECT', [
+        ('OBJECTID', LONG, True), ('CREATEDATE', DATE_FIELD, True), ('CHANGEID', LONG, True),
+        ('LEVELID', INTEGER, True), ('UPDATEDATE', DATE_FIELD, True), ('OBJECTGUID', string(36), True),
+        ('ISACTIVE', FLAG, True)]),
+    'ROOM_TYPES': ('ROOMTYPES', 'ROOMTYPE', [
+        ('ID', INTEGER, True), ('NAME', string(100), True), ('SHORTNAME', string(50), False),
+        ('DESC', string(250), False), ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True),
+        ('ENDDATE', DATE_FIELD, True), ('ISACTIVE', BOOLEAN, True)]),
+    'ROOMS': ('ROOMS', 'ROOM', [
+        ('ID', LONG, True), ('OBJECTID', LONG, True), ('OBJECTGUID', string(36), True), ('CHANGEID', LONG, True),
+        ('NUMBER', string(50), True), ('ROOMTYPE', INTEGER, True), ('OPERTYPEID', INTEGER, True),
+        ('PREVID', LONG, False), ('NEXTID', LONG, False), ('UPDATEDATE', DATE_FIELD, True),
+        ('STARTDATE', DATE_FIELD, True), ('ENDDATE', DATE_FIELD, True), ('ISACTUAL', FLAG, True),
+        ('ISACTIVE', FLAG, True)]),
+    'STEADS': ('STEADS', 'STEAD', [
+        ('ID', LONG, True), ('OBJECTID', LONG, True), ('OBJECTGUID', string(36), True), ('CHANGEID', LONG, True),
+        ('NUMBER', string(250), True), ('OPERTYPEID', string(2), True), ('PREVID', LONG, False),
+        ('NEXTID', LONG, False), ('UPDATEDATE', DATE_FIELD, True), ('STARTDATE', DATE_FIELD, True),
+        ('ENDDATE', DATE_FIELD, True), ('ISACTUAL', FLAG, True), ('ISACTIVE', FLAG, True)]),
+}
+
+# Строк в таблице региона относительно `--rows`, как соотносятся объемы в реальной выгрузке
+WEIGHTS = {
+    'ADDR_OBJ_DIVISION': 0.2,
+    'ADDR_OBJ_PARAMS': 2,
+    'APARTMENTS_PARAMS': 2,
+    'CARPLACES': 0.1,
+    'CARPLACES_PARAMS': 0.2,
+    'HOUSES_PARAMS': 3,
+    'NORMATIVE_DOCS': 0.5,
+    'ROOMS': 0.3,
+    'ROOMS_PARAMS': 0.5,
+    'STEADS_PARAMS': 2,
+}
+COMMON_ROWS = 50
+
+# Диапазоны идентификаторов: ID записей - свой на регион, OBJECTID - свой на регион и таблицу объектов
+REGION_STEP = 10 ** 11
+OBJECT_STEP = 10 ** 10
+OBJECT_TABLES = ['ADDR_OBJ', 'HOUSES', 'STEADS', 'APARTMENTS', 'ROOMS', 'CARPLACES']
+HIERARCHY_TABLES = ['MUN_HIERARCHY', 'ADM_HIERARCHY']
+# Уровни адресных объектов региона: субъект, город, улица (см. OBJECT_LEVELS)
+ADDR_OBJ_LEVELS = {1: 'Респ', 5: 'г', 8: 'ул'}
+
+NAMES = ['Ленина', 'Мира', 'Садовая', 'Молодежная', 'Центральная', 'Победы', 'Школьная', 'Лесная',
+         'ИФНС "ФЛ"', "Д'Артаньяна", 'Проезд 1\\2', 'Рога & Копыта', '<Угловая>', 'Табуляция\tв имени',
+         'Перевод\nстроки']
+# Значения всегда в двойных кавычках, как в выгрузке ФНС
+ENTITIES_ESCAPE = {'"': '&quot;', '\t': '&#9;', '\n': '&#10;'}
+
+
+def compose_schema(entity: str) -> str:
+    collection, element, fields = ENTITIES[entity]
+    lines = ['<?xml version="1.0" encoding="utf-8"?>',
+             '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" elementFormDefault="qualified">',
+             f'\t<xs:element name="{collection}">',
+             f'\t\t<xs:annotation><xs:documentation>Сведения {entity}</xs:documentation></xs:annotation>',
+             '\t\t<xs:complexType>',
+             '\t\t\t<xs:sequence>',
+             f'\t\t\t\t<xs:element name="{element}" maxOccurs="unbounded">',
+             '\t\t\t\t\t<xs:complexType>']
+    for name, field_type, required in fields:
+        use = 'required' if required else 'optional'
+        head = f'\t\t\t\t\t\t<xs:attribute name="{name}" use="{use}"'
+        doc = f'<xs:annotation><xs:documentation>{name}</xs:documentation></xs:annotation>'
+        if field_type[0] in ('date', 'boolean'):
+            lines.append(f'{head} type="xs:{field_type[0]}">{doc}</xs:attribute>')
+            continue
+        if field_type[0] == 'flag':
+            restriction = ('<xs:restriction base="xs:integer"><xs:enumeration value="0"/>'
+                           '<xs:enumeration value="1"/></xs:restriction>')
+        elif field_type[0] in ('long', 'integer'):
+            restriction = (f'<xs:restriction base="xs:{field_type[0]}">'
+                           f'<xs:totalDigits value="{field_type[1]}"/></xs:restriction>')
+        else:
+            restriction = (f'<xs:restriction base="xs:string"><xs:minLength value="1"/>'
+                           f'<xs:maxLength value="{field_type[1]}"/></xs:restriction>')
+        lines.append(f'{head}>{doc}<xs:simpleType>{restriction}</xs:simpleType></xs:attribute>')
+    lines += ['\t\t\t\t\t</xs:complexType>', '\t\t\t\t</xs:element>', '\t\t\t</xs:sequence>',
+              '\t\t</xs:complexType>', '\t</xs:element>', '</xs:schema>', '']
+    return '\n'.join(lines)
+
+
+class RegionLayout:
+    """ Связи записей региона: OBJECTID объектов и их родители. Первый адресный объект - субъект,
+    за ним города (по одному на 50 объектов), остальные - улицы; здания и участки относятся к улицам,
+    помещения и машино-места - к зданиям, комнаты - к помещениям. Записи иерархий, реестра и истории
+    перечисляют объекты по порядку, параметры и деления ссылаются на объекты своей таблицы. """
+    def __init__(self, region: int, counts: dict):
+        self.base = region * REGION_STEP
+        self.counts = counts
+        self.cities = max(1, (counts['ADDR_OBJ'] - 1) // 50)
+
+    @staticmethod
+    def get_counts(rows: int) -> dict:
+        """ Число записей по таблицам региона: иерархии - по записи на объект """
+        counts = {table_name: max(1, int(rows * WEIGHTS.get(table_name, 1))) for table_name in Core.REGION_TABLE_LIST}
+        for table_name in HIERARCHY_TABLES:
+            counts[table_name] = sum(counts[object_table] for object_table in OBJECT_TABLES)
+        return counts
+
+    def links(self, table_name: str, row: int) -> dict:
+        """ Значения атрибутов записи, задающие связи; None - атрибута нет """
+        values = {'ID': self.base + row}
+        if table_name in OBJECT_TABLES:
+            values['OBJECTID'] = self.object_id(table_name, row)
+            if table_name in ('ADDR_OBJ', 'HOUSES'):
+                # Родители адресов всегда актуальны, у остальных объектов флаги случайные
+                values.update(ISACTUAL=1, ISACTIVE=1)
+            if table_name == 'ADDR_OBJ':
+                level = self._get_level(row)
+                values.update(LEVEL=level, TYPENAME=ADDR_OBJ_LEVELS[level])
+        elif table_name in HIERARCHY_TABLES:
+            objectid = self._nth_object(row)
+            path = [objectid]
+            while (parent := self.get_parent(path[0])) is not None:
+                path.insert(0, parent)
+            values.update(OBJECTID=objectid, PARENTOBJID=path[-2] if len(path) > 1 else None,
+                          PATH='.'.join(map(str, path)), ISACTIVE=1)
+        elif table_name in ('REESTR_OBJECTS', 'CHANGE_HISTORY'):
+            values['OBJECTID'] = self._nth_object(row)
+            # Первичный ключ истории изменений
+            values['CHANGEID'] = self.base + row
+        elif table_name.endswith('_PARAMS'):
+            owner = table_name[:-len('_PARAMS')]
+            values['OBJECTID'] = self.object_id(owner, self._pick(owner, row))
+        elif table_name == 'ADDR_OBJ_DIVISION':
+            street = self._get_street(row)
+            values.update(PARENTID=self.get_parent(self.object_id('ADDR_OBJ', street)),
+                          CHILDID=self.object_id('ADDR_OBJ', street))
+        return values
+
+    def object_id(self, table_name: str, row: int) -> int:
+        return self.base + (OBJECT_TABLES.index(table_name) + 1) * OBJECT_STEP + row
+
+    def get_parent(self, objectid: int) -> int | None:
+        table_name = OBJECT_TABLES[(objectid - self.base) // OBJECT_STEP - 1]
+        row = (objectid - self.base) % OBJECT_STEP
+        if table_name == 'ADDR_OBJ':
+            if row == 1:
+                return None
+            if row <= self.cities + 1:
+                return self.object_id('ADDR_OBJ', 1)
+            return self.object_id('ADDR_OBJ', 2 + row % self.cities)
+        if table_name in ('HOUSES', 'STEADS'):
+            return self.object_id('ADDR_OBJ', self._get_street(row))
+        if table_name == 'ROOMS':
+            return self.object_id('APARTMENTS', self._pick('APARTMENTS', row))
+        return self.object_id('HOUSES', self._pick('HOUSES', row))
+
+    def _get_level(self, row: int) -> int:
+        if row == 1:
+            return 1
+        return 5 if row <= self.cities + 1 else 8
+
+    def _get_street(self, row: int) -> int:
+        """ Запись улицы (или последнего адресного объекта, если улиц нет) """
+        first, last = self.cities + 2, self.counts['ADDR_OBJ']
+        if last < first:
+            return last
+        return first + (row - 1) % (last - first + 1)
+
+    def _pick(self, table_name: str, row: int) -> int:
+        return (row - 1) % self.counts[table_name] + 1
+
+    def _nth_object(self, row: int) -> int:
+        """ OBJECTID объекта номер `row` в порядке OBJECT_TABLES (по кругу) """
+        row = (row - 1) % sum(self.counts[table_name] for table_name in OBJECT_TABLES) + 1
+        for table_name in OBJECT_TABLES:
+            if row <= self.counts[table_name]:
+                return self.object_id(table_name, row)
+            row -= self.counts[table_name]
+        raise AssertionError(row)
+
+
+def compose_value(rnd: random.Random, name: str, field_type: tuple, row: int) -> str:
+    kind = field_type[0]
+    if kind == 'date':
+        return f'{rnd.randint(1990, 2079)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}'
+    if kind == 'boolean':
+        return rnd.choice(('true', 'false'))
+    if kind == 'flag':
+        return rnd.choice(('0', '1', '1', '1'))
+    if kind == 'integer':
+        # Целые - ключи и ссылки на общие справочники (типы, уровни, виды операций)
+        return str(row) if name in ('ID', 'LEVEL') else str(rnd.randint(1, COMMON_ROWS))
+    if kind == 'long':
+        return str(row) if name == 'ID' else str(row * 7 + rnd.randint(0, 6))
+    if field_type[1] == 36:
+        return str(uuid.UUID(int=rnd.getrandbits(128)))
+    if name == 'PATH':
+        return '.'.join(str(rnd.randint(1, 10 ** 6)) for _ in range(rnd.randint(2, 6)))
+    value = f'{rnd.choice(NAMES)} {rnd.randint(1, 300)}'
+    return value[:field_type[1]]
+
+
+def write_data(path: str, entity: str, rows: int, seed: int, links=None) -> int:
+    """ XML файл записей сущности, возвращает число записей; `links(row)` - значения, задающие связи """
+    rnd = random.Random(seed)
+    collection, element, fields = ENTITIES[entity]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(f'<?xml version="1.0" encoding="utf-8"?><{collection}>')
+        chunk = []
+        for row in range(1, rows + 1):
+            attributes = []
+            fixed = {} if links is None else links(row)
+            for name, field_type, required in fields:
+                if name in fixed:
+                    if fixed[name] is not None:
+                        attributes.append(f'{name}="{fixed[name]}"')
+                    continue
+                if not required and rnd.random() < 0.3:
+                    continue
+                value = escape(compose_value(rnd, name, field_type, row), ENTITIES_ESCAPE)
+                attributes.append(f'{name}="{value}"')
+            chunk.append(f'<{element} {" ".join(attributes)} />')
+            if len(chunk) == 1000:
+                f.write(''.join(chunk))
+                chunk.clear()
+        f.write(''.join(chunk))
+        f.write(f'</{collection}>')
+    return rows
+
+
+def data_filename(table_name: str, index: int) -> str:
+    return f'AS_{table_name}_{DATE}_{uuid.UUID(int=index)}.XML'
+
+
+def generate(directory: str, rows: int, regions: int = 2, seed: int = 0) -> dict:
+    """ Дерево выгрузки в `directory`; описание (число записей по файлам, размер) - в fixture.json """
+    os.makedirs(directory, exist_ok=True)
+    for entity in Core.KNOWN_ENTITIES:
+        with open(os.path.join(directory, f'AS_{entity}_{SCHEMA_VERSION}.xsd'), 'w', encoding='utf-8') as f:
+            f.write(compose_schema(entity))
+
+    files = {}
+    for i, (table_name, entity) in enumerate(Core.COMMON_TABLE_LIST.items()):
+        filename = data_filename(table_name, i)
+        files[filename] = write_data(os.path.join(directory, filename), entity, COMMON_ROWS, seed + i)
+    counts = RegionLayout.get_counts(rows)
+    for region in range(1, regions + 1):
+        code = f'{region:02d}'
+        os.makedirs(os.path.join(directory, code), exist_ok=True)
+        layout = RegionLayout(region, counts)
+        for i, (table_name, entity) in enumerate(Core.REGION_TABLE_LIST.items()):
+            filename = os.path.join(code, data_filename(table_name, i))
+            files[filename] = write_data(os.path.join(directory, filename), entity, counts[table_name],
+                                         seed + region * 100 + i, functools.partial(layout.links, table_name))
+
+    meta = {
+        'rows': rows,
+        'regions': regions,
+        'seed': seed,
+        'files': files,
+        'total_rows': sum(files.values()),
+        'total_bytes': sum(os.path.getsize(os.path.join(directory, filename)) for filename in files),
+    }
+    with open(os.path.join(directory, 'fixture.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+
+def pack(directory: str, destination: str | None = None) -> tuple[str, str]:
+    """ Архивы как у ФНС: gar_xml.zip с данными и gar_schemas.zip со схемами в `destination`
+    (по умолчанию рядом с `directory`) """
+    parent = destination or os.path.dirname(os.path.abspath(directory))
+    data_archive = os.path.join(parent, 'gar_xml.zip')
+    schema_archive = os.path.join(parent, 'gar_schemas.zip')
+    with zipfile.ZipFile(data_archive, 'w', zipfile.ZIP_DEFLATED) as data_zip, \
+            zipfile.ZipFile(schema_archive, 'w', zipfile.ZIP_DEFLATED) as schema_zip:
+        for root, _, filenames in os.walk(directory):
+            for filename in sorted(filenames):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, directory)
+                if filename.endswith('.xsd'):
+                    schema_zip.write(path, name)
+                elif filename.endswith('.XML'):
+                    data_zip.write(path, name)
+    return data_archive, schema_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic GAR export tree')
+    parser.add_argument('output', help='Target directory')
+    parser.add_argument('--rows', type=int, default=10000, help='Rows per region table (scaled per table)')
+    parser.add_argument('--regions', type=int, default=2, help='Number of region directories')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--zip', action='store_true', help='Also pack gar_xml.zip and gar_schemas.zip')
+    args = parser.parse_args()
+
+    meta = generate(args.output, args.rows, args.regions, args.seed)
+    print(f'{len(meta["files"])} files, {meta["total_rows"]:,} rows, {meta["total_bytes"] / 1024 / 1024:.1f} MiB')
+    if args.zip:
+        for archive in pack(args.output):
+            print(f'{archive}: {os.path.getsize(archive) / 1024 / 1024:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: XML parser backends (`RA_XML_PARSER`) on a large flat GAR-like file.
+
+Usage: python benchmarks/parser.py [ROWS]
+
+For every backend from `ru_address.source.parser.ParserRegistry` reports
+- `parse`: rows/sec of reading every attribute of every record;
+- `dump`: rows/sec of the whole `Data.convert_and_dump` pass (psql representation,
+  `raw` writes bytes rows straight from the memory-mapped file);
+- peak RSS of a fresh process doing the dump,
+and checks that all backends produce identical output.
+Each measurement runs in its own process, so peak RSS is not shared between backends.
+"""
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from encoder import generate
+from ru_address.dump import PostgresConverter
+from ru_address.source.parser import ParserRegistry
+from ru_address.source.xml import Data, Definition
+
+
+class HashSink:
+    encoding = 'utf-8'
+
+    def __init__(self):
+        self.hash = hashlib.sha1()
+
+    def write(self, data):
+        self.hash.update(data.encode('utf-8'))
+
+    def write_bytes(self, data):
+        self.hash.update(data)
+
+
+def run(alias, mode, schema_file, data_file):
+    """ Один замер в текущем процессе """
+    os.environ['RA_XML_PARSER'] = alias
+    definition = Definition('HOUSES', schema_file)
+    table_fields = definition.get_table_fields()
+    data = Data('HOUSES', data_file, PostgresConverter.get_representation(), progress_handler=lambda _: None)
+
+    rows = 0
+    sink = HashSink()
+    start = time.perf_counter()
+    if mode == 'parse':
+        with open(data_file, 'rb') as source:
+            for get in data.parser.iter_records(source, definition.get_entity_tag()):
+                for field in table_fields:
+                    get(field)
+                rows += 1
+    else:
+        data.convert_and_dump(sink, definition, 500)
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'seconds': elapsed,
+        'digest': sink.hash.hexdigest(),
+        # Linux - KiB
+        'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def measure(alias, mode, schema_file, data_file):
+    output = subprocess.run([sys.executable, __file__, '--run', alias, mode, schema_file, data_file],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main(rows):
+    with tempfile.TemporaryDirectory() as directory:
+        schema_file, data_file = generate(directory, rows)
+        print(f'{rows} rows, {os.path.getsize(data_file) / 1024 / 1024:.1f} MiB')
+        print(f'{"parser":<8}{"parse rows/s":>16}{"dump rows/s":>16}{"peak RSS":>12}')
+        digests = set()
+        for alias in ParserRegistry.get_available_parsers_list():
+            parse = measure(alias, 'parse', schema_file, data_file)
+            dump = measure(alias, 'dump', schema_file, data_file)
+            digests.add(dump['digest'])
+            print(f'{alias:<8}'
+                  f'{rows / parse["seconds"]:>16,.0f}'
+                  f'{rows / dump["seconds"]:>16,.0f}'
+                  f'{dump["maxrss"] / 1024:>10.1f}MB')
+        if len(digests) != 1:
+            raise AssertionError('Output mismatch between parsers')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        print(json.dumps(run(*sys.argv[2:6])))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,201 @@
+"""
+Benchmark suite: `dump` for every target × output mode and `schema` for every target on a synthetic GAR tree.
+
+Usage: python benchmarks/suite.py [--rows N] [--regions N] [--fixtures DIR] [--zip] [--target T ...] [--mode M ...]
+                                  [--jobs N] [--repeat N] [--save FILE] [--compare FILE]
+
+Each case runs the real CLI in a fresh process and reports
+- `rows/s` and `MB/s`: source rows and XML megabytes per second of wall time (for `dump`);
+- peak RSS of the process (and its `--jobs` workers, whichever is larger);
+- output size.
+Combinations the CLI rejects (e.g. several tables in one CSV file) are listed as `n/a`.
+The fixture (see `benchmarks/fixtures.py`) is generated into a temporary directory unless `--fixtures` is given.
+`--save` writes results as JSON together with the version and settings, `--compare` prints the difference
+against such a file, e.g. one saved before a change or by the previous release.
+`RA_*` environment variables apply as usual, e.g. `RA_XML_PARSER=expat python benchmarks/suite.py`.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from fixtures import generate, pack
+from ru_address import __version__
+from ru_address.dump import ConverterRegistry as DumpConverterRegistry
+from ru_address.output import OutputRegistry
+from ru_address.schema import ConverterRegistry as SchemaConverterRegistry
+
+
+def run(arguments: list[str], result_file: str):
+    """ Один прогон CLI в текущем процессе, результат - JSON в `result_file` """
+    from ru_address.command import cli  # pylint: disable=import-outside-toplevel
+
+    error = None
+    start = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            cli.main(arguments, standalone_mode=False)
+        except Exception as e:  # pylint: disable=broad-except
+            error = f'{type(e).__name__}: {e}'
+    elapsed = time.perf_counter() - start
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'seconds': elapsed,
+            'error': error,
+            # Linux - KiB
+            'maxrss': max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                          resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss),
+        }, f)
+
+
+def measure(arguments: list[str]) -> dict:
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_file = f.name
+    try:
+        subprocess.run([sys.executable, __file__, '--run', result_file, *arguments], check=True)
+        with open(result_file, encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        os.remove(result_file)
+
+
+def get_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, filename))
+               for root, _, filenames in os.walk(path) for filename in filenames)
+
+
+def compose_cases(args) -> list[dict]:
+    cases = []
+    for target in args.target or DumpConverterRegistry.get_available_platforms_list():
+        for mode in args.mode or OutputRegistry.get_available_modes_list():
+            cases.append({'command': 'dump', 'target': target, 'mode': mode})
+    if not args.mode:
+        for target in SchemaConverterRegistry.get_available_platforms_list():
+            cases.append({'command': 'schema', 'target': target, 'mode': None})
+    return cases
+
+
+def run_case(case: dict, source: str, schema: str, args, meta: dict) -> dict:
+    runs = []
+    for _ in range(max(args.repeat, 1)):
+        output = tempfile.mkdtemp(prefix='ru_address_bench_')
+        try:
+            if case['command'] == 'schema':
+                arguments = ['schema', '--target', case['target'], schema, output]
+            else:
+                # direct - вывод в файл, остальные режимы - в директорию
+                target_path = os.path.join(output, 'dump') if case['mode'] == 'direct' else output
+                arguments = ['dump', '--target', case['target'], '--mode', case['mode'], '--jobs', str(args.jobs),
+                             source, target_path, schema]
+            result = measure(arguments)
+            result['output_bytes'] = get_size(output)
+        finally:
+            shutil.rmtree(output, ignore_errors=True)
+        if result['error'] is not None:
+            return case | result
+        runs.append(result)
+
+    best = min(runs, key=lambda run: run['seconds'])
+    result = case | best
+    if case['command'] == 'dump':
+        result['rows_per_sec'] = meta['total_rows'] / best['seconds']
+        result['mb_per_sec'] = meta['total_bytes'] / 1024 / 1024 / best['seconds']
+    return result
+
+
+def compose_key(result: dict) -> str:
+    return f'{result["command"]} {result["target"]} {result["mode"] or ""}'.strip()
+
+
+def show(results: list[dict], baseline: dict | None):
+    previous = {}
+    if baseline is not None:
+        previous = {compose_key(result): result for result in baseline['results']}
+        print(f'Compared with ru_address {baseline["version"]} ({baseline["timestamp"]})')
+    print(f'{"case":<28}{"seconds":>9}{"rows/s":>12}{"MB/s":>8}{"peak RSS":>11}{"output":>11}'
+          f'{"Δ time":>9}{"Δ RSS":>9}')
+    for result in results:
+        key = compose_key(result)
+        if result['error'] is not None:
+            print(f'{key:<28}{"n/a":>9}  {result["error"][:80]}')
+            continue
+        rate = f'{result["rows_per_sec"]:>12,.0f}{result["mb_per_sec"]:>8.1f}' if 'rows_per_sec' in result \
+            else f'{"":>12}{"":>8}'
+        line = (f'{key:<28}{result["seconds"]:>9.2f}{rate}{result["maxrss"] / 1024:>9.1f}MB'
+                f'{result["output_bytes"] / 1024 / 1024:>9.1f}MB')
+        before = previous.get(key)
+        if before is not None and before.get('error') is None:
+            line += (f'{result["seconds"] / before["seconds"] - 1:>+9.1%}'
+                     f'{result["maxrss"] / before["maxrss"] - 1:>+9.1%}')
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ru_address throughput benchmark suite')
+    parser.add_argument('--rows', type=int, default=20000, help='Rows per region table of the generated fixture')
+    parser.add_argument('--regions', type=int, default=2, help='Regions of the generated fixture')
+    parser.add_argument('--fixtures', help='Use (or generate once into) this fixture directory')
+    parser.add_argument('--zip', action='store_true', help='Read sources from gar_xml.zip / gar_schemas.zip')
+    parser.add_argument('--target', action='append', choices=DumpConverterRegistry.get_available_platforms_list(),
+                        help='Limit dump targets')
+    parser.add_argument('--mode', action='append', choices=OutputRegistry.get_available_modes_list(),
+                        help='Limit output modes (skips `schema`)')
+    parser.add_argument('--jobs', type=int, default=1, help='`--jobs` for dump')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case, the fastest is reported')
+    parser.add_argument('--save', help='Save results to a JSON file')
+    parser.add_argument('--compare', help='Compare with results saved by `--save`')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as directory:
+        fixtures = args.fixtures or os.path.join(directory, 'gar')
+        if os.path.exists(os.path.join(fixtures, 'fixture.json')):
+            with open(os.path.join(fixtures, 'fixture.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        else:
+            meta = generate(fixtures, args.rows, args.regions)
+        source = schema = fixtures
+        if args.zip:
+            source, schema = pack(fixtures, directory)
+        print(f'ru_address {__version__}, {meta["total_rows"]:,} rows, '
+              f'{meta["total_bytes"] / 1024 / 1024:.1f} MiB of XML, {meta["regions"]} regions')
+
+        results = [run_case(case, source, schema, args, meta) for case in compose_cases(args)]
+
+    show(results, baseline)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': __version__,
+                'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'fixture': {key: meta[key] for key in ('rows', 'regions', 'seed', 'total_rows', 'total_bytes')},
+                'settings': {'jobs': args.jobs, 'repeat': args.repeat, 'zip': args.zip,
+                             'env': {key: value for key, value in os.environ.items() if key.startswith('RA_')}},
+                'results': results,
+            }, f, indent=1, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run(sys.argv[3:], sys.argv[2])
+    else:
+        main()
@@ -2,3 +2,14 @@ import os.path
 from ._version import __version__
 
 package_directory = os.path.dirname(os.path.abspath(__file__))
+
+# Потоковое чтение таблиц (см. ru_address.reader) подгружается при первом обращении:
+# setup.py импортирует пакет ради __version__ еще до установки зависимостей
+_READER_EXPORTS = ('iter_rows', 'iter_batches', 'get_fields')
+
+
+def __getattr__(name):
+    if name in _READER_EXPORTS:
+        from ru_address import reader  # pylint: disable=import-outside-toplevel
+        return getattr(reader, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
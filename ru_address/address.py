@@ -0,0 +1,266 @@
+import heapq
+import operator
+import os
+from array import array
+from bisect import bisect_left
+from itertools import count, islice
+from ru_address.common import Common
+from ru_address.core import Core
+from ru_address.errors import SourceError
+from ru_address.reader import get_fields, iter_rows
+from ru_address.source.xml import DefinitionCache
+
+
+class CompactIndex:
+    """ Отображение OBJECTID -> значения без словаря: отсортированный array('q') ключей и параллельные колонки
+    (array или list) в том же порядке, поиск - bisect. Ключ занимает 8 байт, значение в array('q') - еще 8,
+    против ~100 байт на запись в dict. Записи добавляются в `keys` и `columns` в порядке чтения, `freeze`
+    упорядочивает их по ключу; из повторяющихся ключей находится добавленный первым. """
+    # Куски сортируются списком позиций (~50 байт на запись), на время `freeze` это предел его роста
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, *columns):
+        self.keys = array('q')
+        self.columns = list(columns)
+
+    def freeze(self):
+        """ Упорядочивание по ключу: куски по CHUNK_SIZE сортируются на месте и сливаются в порядок позиций
+        array('q'), затем колонки по одной пересобираются в этом порядке. Пик памяти сверх индекса -
+        8 байт на запись под порядок и по одной пересобираемой колонке, а не список объектов на весь индекс """
+        keys = self.keys
+        if all(map(operator.le, keys, islice(keys, 1, None))):
+            return
+        size = len(keys)
+        chunks = range(0, size, CompactIndex.CHUNK_SIZE)
+        for start in chunks:
+            stop = min(start + CompactIndex.CHUNK_SIZE, size)
+            order = sorted(range(start, stop), key=keys.__getitem__)
+            keys[start:stop] = array('q', map(keys.__getitem__, order))
+            for column in self.columns:
+                column[start:stop] = CompactIndex._reorder(column, order)
+
+        if len(chunks) > 1:
+            # Пары (ключ, позиция): при равных ключах раньше идет добавленный раньше
+            runs = [zip(islice(keys, start, start + CompactIndex.CHUNK_SIZE), count(start))
+                    for start in chunks]
+            order = array('q', map(operator.itemgetter(1), heapq.merge(*runs)))
+            # Старая колонка освобождается сразу после замены
+            self.keys = CompactIndex._reorder(keys, order)
+            del keys
+            for i in range(len(self.columns)):
+                self.columns[i] = CompactIndex._reorder(self.columns[i], order)
+
+    @staticmethod
+    def _reorder(column, order):
+        if isinstance(column, array):
+            return array(column.typecode, map(column.__getitem__, order))
+        return list(map(column.__getitem__, order))
+
+    def find(self, key) -> int:
+        """ Позиция ключа в колонках, -1 - ключа нет """
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return i
+        return -1
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class AddressSource:
+    """ Записи производной таблицы FULL_ADDRESS региона: полный адрес каждого здания, помещения и земельного участка
+    и идентификаторы его предков по уровням.
+    Сначала строятся индексы (CompactIndex) только по актуальным записям: иерархия (муниципальная или
+    административная, ``RA_ADDRESS_HIERARCHY``) - OBJECTID -> PARENTOBJID, адресные объекты - OBJECTID -> тип,
+    наименование и уровень; затем потоком читаются здания, земельные участки и помещения. Кэшируются адреса только
+    предков других адресных объектов (субъект, район, город и т.п., их немного), адрес улицы собирается заново
+    от закэшированного родителя; здания помещений находятся по индексу зданий, собранному при их чтении.
+    Для крупных регионов память - в основном иерархия (все ее записи, включая помещения, машино-места и т.п.):
+    16 байт на запись, на время упорядочивания (CompactIndex.freeze) - еще до ~25 байт на запись. """
+    TABLE_NAME = 'FULL_ADDRESS'
+    HIERARCHIES = {
+        'mun': 'MUN_HIERARCHY',
+        'adm': 'ADM_HIERARCHY',
+    }
+    # Уровни адресных объектов с колонками LEVEL{N}_OBJECTID (см. OBJECT_LEVELS)
+    LEVELS = range(1, 9)
+    HOUSE_LEVEL = 10
+    APARTMENT_LEVEL = 11
+    STEAD_LEVEL = 9
+    STEAD_TYPE = 'з/у'
+
+    def __init__(self, source_path: str, schema_path: str, region: str, hierarchy: str = 'mun'):
+        AddressSource.get_hierarchy_table(hierarchy)
+        self.source_path = source_path
+        self.schema_path = schema_path
+        self.region = region
+        self.hierarchy = hierarchy
+        self.source_bytes = 0
+        self.fields = None
+        self._parents = CompactIndex(array('q'))
+        self._objects = CompactIndex([], [], array('b'))
+        self._addresses = {}
+
+    @staticmethod
+    def get_hierarchy_table(hierarchy: str) -> str:
+        if hierarchy not in AddressSource.HIERARCHIES:
+            raise SourceError(f"Unknown address hierarchy `{hierarchy}`, expected one of: "
+                              f"{', '.join(AddressSource.HIERARCHIES)}")
+        return AddressSource.HIERARCHIES[hierarchy]
+
+    @staticmethod
+    def get_source_tables(hierarchy: str = 'mun') -> list[tuple[str, bool]]:
+        """ Исходные таблицы: (имя, региональная ли) """
+        return [('HOUSE_TYPES', False), ('ADDHOUSE_TYPES', False), ('APARTMENT_TYPES', False),
+                ('ADDR_OBJ', True), (AddressSource.get_hierarchy_table(hierarchy), True),
+                ('HOUSES', True), ('STEADS', True), ('APARTMENTS', True)]
+
+    def iter_records(self):
+        """ Записи таблицы функциями `get`, как у парсеров XML (значения - строки, отсутствующее - None) """
+        house_types = self._read_types('HOUSE_TYPES')
+        add_types = self._read_types('ADDHOUSE_TYPES')
+        apartment_types = self._read_types('APARTMENT_TYPES')
+        self._build_indexes()
+        fields = self.fields
+
+        houses = CompactIndex([])
+        for objectid, guid, number, addnum1, addnum2, housetype, addtype1, addtype2 in self._iter_table(
+                'HOUSES', ['OBJECTID', 'OBJECTGUID', 'HOUSENUM', 'ADDNUM1', 'ADDNUM2', 'HOUSETYPE', 'ADDTYPE1',
+                           'ADDTYPE2']):
+            label = ' '.join(filter(None, (
+                AddressSource._compose_label(house_types.get(housetype), number),
+                AddressSource._compose_label(add_types.get(addtype1), addnum1),
+                AddressSource._compose_label(add_types.get(addtype2), addnum2),
+            )))
+            houses.keys.append(objectid)
+            houses.columns[0].append(label)
+            parent = self._get_parent(objectid)
+            yield self._compose_row(fields, objectid, guid, AddressSource.HOUSE_LEVEL, parent, objectid, label)
+
+        for objectid, guid, number in self._iter_table('STEADS', ['OBJECTID', 'OBJECTGUID', 'NUMBER']):
+            label = AddressSource._compose_label(AddressSource.STEAD_TYPE, number)
+            parent = self._get_parent(objectid)
+            yield self._compose_row(fields, objectid, guid, AddressSource.STEAD_LEVEL, parent, None, label)
+
+        houses.freeze()
+        for objectid, guid, number, aparttype in self._iter_table(
+                'APARTMENTS', ['OBJECTID', 'OBJECTGUID', 'NUMBER', 'APARTTYPE']):
+            label = AddressSource._compose_label(apartment_types.get(aparttype), number)
+            house = self._get_parent(objectid)
+            i = houses.find(house) if house is not None else -1
+            if i < 0:
+                yield self._compose_row(fields, objectid, guid, AddressSource.APARTMENT_LEVEL, house, None, label)
+                continue
+            yield self._compose_row(fields, objectid, guid, AddressSource.APARTMENT_LEVEL, self._get_parent(house),
+                                    house, houses.columns[0][i], label, parent=house)
+
+    def _compose_row(self, fields, objectid, guid, level, owner, house, *labels, parent=None):
+        """ `owner` - адресный объект, к которому относятся `labels` (подписи здания и помещения) """
+        address, ancestors = self._compose_address(owner)
+        full_address = ', '.join(filter(None, (address, *labels)))
+        if parent is None:
+            parent = owner
+        values = (str(objectid), guid, str(level), None if parent is None else str(parent),
+                  None if house is None else str(house), full_address or None, *ancestors)
+        return dict(zip(fields, values)).get
+
+    def _compose_address(self, objectid) -> tuple[str, tuple]:
+        """ Адрес адресного объекта и OBJECTID его предков (и его самого) по уровням LEVELS """
+        empty = ('', (None,) * len(AddressSource.LEVELS))
+        if objectid is None:
+            return empty
+        cached = self._addresses.get(objectid)
+        if cached is not None:
+            return cached
+
+        # Цепочка вверх до закэшированного предка или до объекта вне индекса
+        chain = []
+        seen = set()
+        current = objectid
+        base = empty
+        # Цикл в иерархии обрывает цепочку
+        while current is not None and current not in seen:
+            seen.add(current)
+            if current in self._addresses:
+                base = self._addresses[current]
+                break
+            i = self._objects.find(current)
+            if i < 0:
+                break
+            chain.append((current, i))
+            current = self._get_parent(current)
+
+        if not chain:
+            # Не адресный объект (или вне индекса) - не кэшируется
+            return base
+
+        names, typenames, levels = self._objects.columns
+        address, ancestors = base
+        for current, i in reversed(chain):
+            address = ', '.join(filter(None, (address, AddressSource._compose_label(typenames[i], names[i]))))
+            if levels[i] in AddressSource.LEVELS:
+                ancestors = ancestors[:levels[i] - 1] + (str(current),) + ancestors[levels[i]:]
+            if current != objectid:
+                # Кэш ограничен предками адресных объектов, запрошенный объект (обычно улица) не кэшируется
+                self._addresses[current] = (address, ancestors)
+        return address, ancestors
+
+    def _get_parent(self, objectid):
+        i = self._parents.find(objectid)
+        if i < 0:
+            return None
+        return self._parents.columns[0][i] or None
+
+    def _build_indexes(self):
+        self.fields = DefinitionCache.get(AddressSource.TABLE_NAME, Core.DERIVED_SCHEMA_PATH,
+                                          AddressSource.TABLE_NAME).get_table_fields()
+
+        parents = CompactIndex(array('q'))
+        keys, values = parents.keys, parents.columns[0]
+        for objectid, parentobjid in self._iter_table(AddressSource.get_hierarchy_table(self.hierarchy),
+                                                      ['OBJECTID', 'PARENTOBJID']):
+            keys.append(objectid)
+            values.append(parentobjid or 0)
+        parents.freeze()
+        self._parents = parents
+
+        objects = CompactIndex([], [], array('b'))
+        names, typenames, levels = objects.columns
+        # Типов адресных объектов немного, строки типа общие
+        shared = {}
+        for objectid, name, typename, level in self._iter_table('ADDR_OBJ', ['OBJECTID', 'NAME', 'TYPENAME', 'LEVEL']):
+            objects.keys.append(objectid)
+            names.append(name)
+            typenames.append(shared.setdefault(typename, typename))
+            # LEVEL в схеме ADDR_OBJ - строка
+            levels.append(int(level) if level and level.isdigit() and int(level) <= 127 else 0)
+        objects.freeze()
+        self._objects = objects
+
+    def _read_types(self, table_name: str) -> dict:
+        """ ID типа -> краткое наименование (общие таблицы небольшие) """
+        return {type_id: shortname or name
+                for type_id, name, shortname in self._iter_table(table_name, ['ID', 'NAME', 'SHORTNAME'], False)}
+
+    def _iter_table(self, table_name: str, columns: list[str], actual: bool = True):
+        """ Значения `columns` записей таблицы региона (общей - для `actual=False`) в порядке `columns`;
+        с `actual` - только актуальных и действующих записей """
+        region = self.region if actual else None
+        all_fields = get_fields(self.schema_path, table_name)
+        where = [f'{field}=1' for field in ('ISACTUAL', 'ISACTIVE') if actual and field in all_fields]
+        fields = get_fields(self.schema_path, table_name, columns)
+        reorder = operator.itemgetter(*[fields.index(column) for column in columns])
+
+        path = self.source_path if region is None else os.path.join(self.source_path, region)
+        self.source_bytes += Common.get_source_stat(Common.get_source_filepath(path, table_name, 'xml'))[0]
+        for row in iter_rows(self.source_path, table_name, region, columns, self.schema_path, where):
+            yield reorder(row)
+
+    @staticmethod
+    def _compose_label(typename, name) -> str:
+        if not name:
+            return ''
+        if not typename:
+            return str(name)
+        return f'{typename} {name}'
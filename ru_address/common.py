@@ -1,8 +1,11 @@
 import glob
 import os
 import re
+import threading
 import time
+import zlib
 import psutil
+from ru_address.source.archive import Archive
 
 
 class Common:
@@ -45,13 +48,17 @@ class Common:
 
     @staticmethod
     def get_source_filepath(source_path, table, extension):
-        """ Ищем файл таблицы в папке с исходниками,
+        """ Ищем файл таблицы в папке с исходниками (или в ZIP архиве),
         Названия файлов в непонятном формате, например AS_ACTSTAT_2_250_08_04_01_01.xsd"""
+        archive = Archive.split(source_path)
         found_files = []
         for _extension in [extension.lower(), extension.upper()]:
             file = f'AS_{table}_2*.{_extension}'
             file_path = os.path.join(source_path, file)
-            found_files = found_files + glob.glob(file_path)
+            if archive is None:
+                found_files = found_files + glob.glob(file_path)
+            else:
+                found_files = found_files + Archive.find(*archive, file)
 
         if len(found_files) == 1:
             return found_files[0]
@@ -59,6 +66,68 @@ class Common:
             raise FileNotFoundError(f'More than one file found: {file_path}')
         raise FileNotFoundError(f'Not found source file: {file_path}')
 
+    @staticmethod
+    def open_source(filepath):
+        """ Открывает файл выгрузки на чтение, в т.ч. находящийся внутри ZIP архива """
+        archive = Archive.split(filepath)
+        if archive is None:
+            return open(filepath, 'rb')
+        return Archive.open(*archive)
+
+    @staticmethod
+    def get_source_stat(filepath) -> tuple[int, float]:
+        """ Размер и время изменения файла выгрузки """
+        archive = Archive.split(filepath)
+        if archive is None:
+            stat = os.stat(filepath)
+            return stat.st_size, stat.st_mtime
+        return Archive.stat(*archive)
+
+    @staticmethod
+    def get_source_checksum(filepath) -> int:
+        """ CRC32 содержимого файла выгрузки (для файла в ZIP архиве совпадает с записанным в архиве) """
+        archive = Archive.split(filepath)
+        if archive is not None:
+            return Archive.checksum(*archive)
+        crc = 0
+        with open(filepath, 'rb') as f:
+            while block := f.read(1024 * 1024):
+                crc = zlib.crc32(block, crc)
+        return crc
+
+
+class ProgressCounter:
+    """ Сводный прогресс параллельного дампа: строки от всех процессов и завершенные части """
+    def __init__(self, queue, units_total):
+        self.queue = queue
+        self.units_total = units_total
+        self.units_done = 0
+        self.rows = 0
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+
+    def start(self):
+        self._listener.start()
+
+    def stop(self):
+        self.queue.put(None)
+        self._listener.join()
+        print("")  # Перенос после прогресс-бара
+
+    def unit_done(self):
+        self.units_done += 1
+        self.show()
+
+    def show(self):
+        print(f"\r{self.units_done}/{self.units_total} parts, {self.rows}+ row", end="", flush=True)
+
+    def _listen(self):
+        while True:
+            delta = self.queue.get()
+            if delta is None:
+                break
+            self.rows += delta
+            self.show()
+
 
 class DataSource:
     """ Представление файла под SAX-reader """
@@ -88,7 +157,8 @@ class TableRepresentation:
     """ Набор параметров для презентации табличных данных в виде текстового файла """
     def __init__(self, quotes="\"", quotes_system="`", delimiter=", ", row_indent="\t", row_parentheses=("(", ")"),
                  line_ending=',\n', line_ending_last=';\n', bool_repr=('0', '1'), null_repr="NULL", escape=None,
-                 table_start_handler=None, table_end_handler=None, batch_start_handler=None):
+                 table_start_handler=None, table_end_handler=None, batch_start_handler=None,
+                 bool_native=None, date_quotes=None, batch_end_handler=None):
         self.quotes = quotes
         self.quotes_system = quotes_system
         self.delimiter = delimiter
@@ -97,6 +167,9 @@ class TableRepresentation:
         self.line_ending = line_ending
         self.line_ending_last = line_ending_last
         self.bool_repr = bool_repr
+        # Представление полей с типом из XSD (RA_TYPED_VALUES): boolean-литералы и кавычки для дат
+        self.bool_native = bool_repr if bool_native is None else bool_native
+        self.date_quotes = quotes if date_quotes is None else date_quotes
         self.null_repr = null_repr
         self.escape = None
         if isinstance(escape, dict):
@@ -104,3 +177,5 @@ class TableRepresentation:
         self.table_start_handler = table_start_handler
         self.table_end_handler = table_end_handler
         self.batch_start_handler = batch_start_handler
+        # Окончание пачки вместо line_ending_last (например, ON CONFLICT для upsert)
+        self.batch_end_handler = batch_end_handler
@@ -1,5 +1,6 @@
 import datetime
-from ru_address import __version__
+import os.path
+from ru_address import __version__, package_directory
 
 
 class Core:
@@ -64,10 +65,34 @@ class Core:
         'STEADS_PARAMS': 'PARAM',
     }
 
+    # Производные таблицы региона собираются из нескольких исходных (см. AddressSource),
+    # в дамп попадают только при явном указании в `--table`; их XSD схемы поставляются с пакетом
+    DERIVED_TABLE_LIST = {
+        'FULL_ADDRESS': 'FULL_ADDRESS',
+    }
+
+    DERIVED_SCHEMA_PATH = os.path.join(package_directory, 'resources', 'schemas')
+
     @staticmethod
     def get_known_tables():
         return Core.COMMON_TABLE_LIST | Core.REGION_TABLE_LIST
 
+    @staticmethod
+    def get_all_tables():
+        """ Исходные и производные таблицы """
+        return Core.get_known_tables() | Core.DERIVED_TABLE_LIST
+
+    @staticmethod
+    def get_region_tables() -> list[str]:
+        return list(Core.REGION_TABLE_LIST) + list(Core.DERIVED_TABLE_LIST)
+
+    @staticmethod
+    def get_schema_path(table_name, schema_path):
+        """ Где искать XSD таблицы: для производных - в ресурсах пакета """
+        if table_name in Core.DERIVED_TABLE_LIST:
+            return Core.DERIVED_SCHEMA_PATH
+        return schema_path
+
     @staticmethod
     def compose_copyright():
         """ Сообщение в заголовок сгенерированного файла """
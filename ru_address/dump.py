@@ -1,17 +1,31 @@
+import functools
 import glob
 import os.path
+import time
 from abc import ABC, abstractmethod
 from typing import TextIO
 
-from ru_address.errors import UnknownPlatformError
-from ru_address.source.xml import Definition, Data
+from ru_address.address import AddressSource
+from ru_address.errors import MissingDependencyError, UnknownPlatformError
+from ru_address.source.archive import Archive
+from ru_address.encoder import ChRowBinaryEncoder, PgBinaryRowEncoder, ValueRowEncoder
+from ru_address.schema import ClickhouseConverter as ClickhouseSchemaConverter, \
+    PostgresConverter as PostgresSchemaConverter
+from ru_address.source.xml import Definition, DefinitionCache, Data, BinaryData
 from ru_address.core import Core
+from ru_address.index import Index
+from ru_address.metrics import UnitMetrics
 from ru_address.common import Common, TableRepresentation
+from ru_address.writer import ByteStream
 
 
 def regions_from_directory(source_path: str):
-    matched = glob.glob('*', root_dir=source_path)
-    return [f for f in matched if f.isnumeric()]
+    archive = Archive.split(source_path)
+    if archive is None:
+        matched = glob.glob('*', root_dir=source_path)
+    else:
+        matched = Archive.list_directories(*archive)
+    return sorted(f for f in matched if f.isnumeric())
 
 
 class ConverterRegistry:
@@ -35,8 +49,12 @@ class ConverterRegistry:
         return {
             'mysql':  MyConverter,
             'psql':   PostgresConverter,
+            'pgcopy': PostgresCopyConverter,
+            'pgbinary': PostgresBinaryConverter,
             'csv':    PlainCommaConverter,
             'tsv':    PlainTabConverter,
+            'parquet': ParquetConverter,
+            'ch':     ClickhouseConverter,
         }
 
     @staticmethod
@@ -52,21 +70,113 @@ class BaseDumpConverter(ABC):
         self.source_path = source_path
         self.schema_path = schema_path
         self.batch_size = int(os.environ.get("RA_BATCH_SIZE", "500"))
-
-    def convert_table(self, file: TextIO, table_name: str, sub: str | None = None):
+        self.typed_values = os.environ.get("RA_TYPED_VALUES", "1") == "1"
+        # INSERT с обновлением существующих записей по первичному ключу (для дельта-выгрузок)
+        self.upsert = False
+        # Отбор записей по условиям на атрибуты (RowFilter, `--where`)
+        self.row_filter = None
+        # Выбранные колонки по таблицам (`--columns`), остальные таблицы целиком
+        self.columns = {}
+        # Процессов на разбор одного большого файла частями (`--split-jobs`), размер части в MiB
+        self.split_jobs = 1
+        self.split_size = int(float(os.environ.get("RA_SPLIT_SIZE", "64")) * 1024 * 1024)
+        # Сбор метрик по таблицам (`--metrics`), см. UnitMetrics
+        self.collect_metrics = False
+        # Иерархия для адресов производной таблицы FULL_ADDRESS: mun - муниципальная, adm - административная
+        self.address_hierarchy = os.environ.get("RA_ADDRESS_HIERARCHY", "mun")
+        self.progress_handler = None
+
+    def __getstate__(self):
+        # Конвертер передается процессам-обработчикам, обработчик прогресса у каждого свой
+        return self.__dict__ | {'progress_handler': None}
+
+    def convert_table(self, file: TextIO, table_name: str, sub: str | None = None) -> UnitMetrics | None:
+        """ Дамп таблицы в `file`; с `collect_metrics` возвращает ее метрики """
         dump_file = file
 
-        tables = Core.get_known_tables()
-        source_filepath = Common.get_source_filepath(self.schema_path, tables[table_name], 'xsd')
-        definition = Definition(table_name, source_filepath)
+        definition = self.get_definition(table_name)
+        data = self.setup_metrics(self.get_data(table_name, sub, definition), table_name, sub)
+        data = self.setup_source(data, table_name, sub)
+        data.convert_and_dump(dump_file, definition, self.batch_size)
+        return data.metrics
+
+    def get_data(self, table_name: str, sub: str | None, definition: Definition) -> Data:
+        """ Источник данных таблицы; `definition` нужна форматам, кодировщик которых зависит от типов полей """
+        # pylint: disable=unused-argument
+        representation = self.get_representation()
+        if self.upsert:
+            representation.batch_end_handler = self.get_upsert_handler()
+
+        source_filepath = self.get_source_filepath(table_name, sub)
+        data = Data(table_name, source_filepath, representation, self.progress_handler, self.typed_values,
+                    self.get_row_filter(table_name))
+        return self.setup_split(data, table_name, sub)
+
+    def setup_split(self, data: Data, table_name: str, sub: str | None) -> Data:
+        """ Разбор файла частями: части кодируются в процессах-обработчиках тем же конвертером """
+        if self.split_jobs > 1:
+            data.split_jobs = self.split_jobs
+            data.split_size = self.split_size
+            data.range_handler = functools.partial(_encode_range, self, table_name, sub)
+        return data
+
+    def setup_metrics(self, data: Data, table_name: str, sub: str | None) -> Data:
+        if self.collect_metrics:
+            data.metrics = UnitMetrics(table_name, sub)
+        return data
+
+    def setup_source(self, data: Data, table_name: str, sub: str | None) -> Data:
+        """ Записи производной таблицы собираются из исходных таблиц региона """
+        if table_name == AddressSource.TABLE_NAME:
+            data.record_source = AddressSource(self.source_path, self.schema_path, sub, self.address_hierarchy)
+        return data
+
+    def get_options(self) -> dict:
+        """ Параметры конвертера, от которых зависит содержимое дампа """
+        return {
+            'batch_size': self.batch_size,
+            'typed_values': self.typed_values,
+            'upsert': self.upsert,
+            'where': None if self.row_filter is None else self.row_filter.expressions,
+            'columns': self.columns,
+            'address_hierarchy': self.address_hierarchy,
+        }
 
+    def get_row_filter(self, table_name: str):
+        if self.row_filter is None:
+            return None
+        # Условия могут быть и на поля, не попавшие в `columns`
+        definition = DefinitionCache.get(table_name, Core.get_schema_path(table_name, self.schema_path),
+                                         Core.get_all_tables()[table_name])
+        return self.row_filter.compile(table_name, definition.get_table_fields(), definition.get_field_types())
+
+    def get_source_filepath(self, table_name: str, sub: str | None = None) -> str:
+        """ XML файл таблицы; для производной таблицы - директория региона """
         path = self.source_path
         if sub is not None:
             path = os.path.join(self.source_path, sub)
+        if table_name in Core.DERIVED_TABLE_LIST:
+            return path
+        return Common.get_source_filepath(path, table_name, 'xml')
+
+    def get_source_filepaths(self, table_name: str, sub: str | None = None) -> list[str]:
+        """ XML файлы, из которых собирается таблица """
+        if table_name not in Core.DERIVED_TABLE_LIST:
+            return [self.get_source_filepath(table_name, sub)]
+        return [self.get_source_filepath(source_table, sub if regional else None)
+                for source_table, regional in AddressSource.get_source_tables(self.address_hierarchy)]
+
+    def get_definition(self, table_name: str) -> Definition:
+        definition = DefinitionCache.get(table_name, Core.get_schema_path(table_name, self.schema_path),
+                                         Core.get_all_tables()[table_name])
+        if table_name in self.columns:
+            return definition.select(self.columns[table_name])
+        return definition
 
-        source_filepath = Common.get_source_filepath(path, table_name, 'xml')
-        data = Data(table_name, source_filepath, self.get_representation())
-        data.convert_and_dump(dump_file, definition, self.batch_size)
+    @staticmethod
+    def get_upsert_handler():
+        """ batch_end_handler для upsert, None - формат не поддерживает upsert """
+        return None
 
     @staticmethod
     @abstractmethod
@@ -87,6 +197,14 @@ class BaseDumpConverter(ABC):
         pass
 
 
+def _encode_range(converter: BaseDumpConverter, table_name: str, sub: str | None, source_range, raw: bool,
+                  binary: bool):
+    """ Кодирование части файла в процессе-обработчике, см. Data.encode_range """
+    definition = converter.get_definition(table_name)
+    data = converter.setup_metrics(converter.get_data(table_name, sub, definition), table_name, sub)
+    return data.encode_range(definition, source_range, raw, binary)
+
+
 class MyConverter(BaseDumpConverter):
     """
     MySQL (and MySQL forks) compatible converter
@@ -96,13 +214,16 @@ class MyConverter(BaseDumpConverter):
         BaseDumpConverter.__init__(self, source_path, schema_path)
         self.encoding = os.environ.get("RA_SQL_ENCODING", "utf8mb4")
 
+    def get_options(self) -> dict:
+        return BaseDumpConverter.get_options(self) | {'encoding': self.encoding}
+
     @staticmethod
     def get_extension() -> str:
         return 'sql'
 
     @staticmethod
     def get_representation() -> TableRepresentation:
-        def table_start_handler(table_name: str) -> str:
+        def table_start_handler(table_name: str, fields: list[str]) -> str:  # pylint: disable=unused-argument
             return (
                 '\n'
                 f'/*!40000 ALTER TABLE `{table_name}` DISABLE KEYS */;\n'
@@ -129,6 +250,16 @@ class MyConverter(BaseDumpConverter):
         return TableRepresentation(table_start_handler=table_start_handler, table_end_handler=table_end_handler,
                                    batch_start_handler=batch_start_handler, escape=escape)
 
+    @staticmethod
+    def get_upsert_handler():
+        def batch_end_handler(table_name: str, fields: list[str]) -> str:
+            keys = Index.get_primary_keys(table_name)
+            updates = ", ".join(f'`{field}` = VALUES(`{field}`)' for field in fields if field not in keys)
+            if not keys or not updates:
+                return ';\n'
+            return f'\nON DUPLICATE KEY UPDATE {updates};\n'
+        return batch_end_handler
+
     def compose_dump_header(self) -> str:
         """ Подготовка к импорту """
         header = ("/*!40101 SET @OLD_CHARACTER_SET_CLIENT=@@CHARACTER_SET_CLIENT */;\n"
@@ -168,8 +299,125 @@ class PostgresConverter(BaseDumpConverter):
             "\'": "\\\'"
         }
 
-        return TableRepresentation(quotes="'", bool_repr=("'0'", "'1'"), batch_start_handler=batch_start_handler,
-                                   escape=escape)
+        return TableRepresentation(quotes="'", bool_repr=("'0'", "'1'"), bool_native=("false", "true"),
+                                   batch_start_handler=batch_start_handler, escape=escape)
+
+    @staticmethod
+    def get_upsert_handler():
+        def batch_end_handler(table_name: str, fields: list[str]) -> str:
+            keys = Index.get_primary_keys(table_name)
+            if not keys:
+                return ';\n'
+            key_query = '", "'.join(keys)
+            updates = ", ".join(f'"{field}" = EXCLUDED."{field}"' for field in fields if field not in keys)
+            if not updates:
+                return f'\nON CONFLICT ("{key_query}") DO NOTHING;\n'
+            return f'\nON CONFLICT ("{key_query}") DO UPDATE SET {updates};\n'
+        return batch_end_handler
+
+    def compose_dump_header(self) -> str:
+        return ""
+
+    def compose_dump_footer(self) -> str:
+        return ""
+
+
+class PostgresCopyConverter(BaseDumpConverter):
+    """
+    PostgreSQL COPY text format converter, output is ready for `psql -f`
+    See: https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.2
+    """
+    @staticmethod
+    def get_extension() -> str:
+        return 'sql'
+
+    @staticmethod
+    def get_representation() -> TableRepresentation:
+        def table_start_handler(table_name: str, fields: list[str]) -> str:
+            field_query = "\", \"".join(fields)
+            return (
+                f'COPY "{table_name}" ("{field_query}") FROM STDIN;\n'
+            )
+
+        def table_end_handler(table_name: str) -> str:  # pylint: disable=unused-argument
+            return '\\.\n'
+
+        # Escape backslash and control characters
+        # ...NAME="ИФНС&#009;ФЛ\"... -> ...ИФНС\tФЛ\\...
+        escape = {
+            "\\": "\\\\",
+            "\r": "\\r",
+            "\n": "\\n",
+            "\t": "\\t"
+        }
+
+        return TableRepresentation(quotes="", delimiter="\t", null_repr="\\N", bool_repr=("f", "t"),
+                                   row_indent="", row_parentheses=("", ""),
+                                   line_ending="\n", line_ending_last="\n", escape=escape,
+                                   table_start_handler=table_start_handler, table_end_handler=table_end_handler)
+
+    def compose_dump_header(self) -> str:
+        return "SET client_encoding = 'UTF8';\n"
+
+    def compose_dump_footer(self) -> str:
+        return ""
+
+
+class PostgresBinaryConverter(BaseDumpConverter):
+    """
+    PostgreSQL COPY binary format converter, file per table
+    Column types follow `schema --target psql`, load with `COPY ... FROM ... WITH (FORMAT binary)`
+    See: https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4
+    """
+    def get_data(self, table_name: str, sub: str | None, definition: Definition) -> Data:
+        column_types = [PostgresSchemaConverter.get_column_type(field_type)
+                        for field_type in definition.get_field_types()]
+        encoder = PgBinaryRowEncoder(definition.get_table_fields(), column_types)
+
+        source_filepath = self.get_source_filepath(table_name, sub)
+        data = BinaryData(table_name, source_filepath, encoder.encode,
+                          PgBinaryRowEncoder.SIGNATURE, PgBinaryRowEncoder.TRAILER, self.progress_handler,
+                          self.get_row_filter(table_name))
+        return self.setup_split(data, table_name, sub)
+
+    @staticmethod
+    def get_extension() -> str:
+        return 'bin'
+
+    @staticmethod
+    def get_representation() -> TableRepresentation:
+        return TableRepresentation()
+
+    def compose_dump_header(self) -> str:
+        return ""
+
+    def compose_dump_footer(self) -> str:
+        return ""
+
+
+class ClickhouseConverter(BaseDumpConverter):
+    """
+    ClickHouse RowBinary converter, column types follow `schema --target ch`
+    Load with `clickhouse-client --query "INSERT INTO table FORMAT RowBinary" < file`
+    See: https://clickhouse.com/docs/en/interfaces/formats#rowbinary
+    """
+    def get_data(self, table_name: str, sub: str | None, definition: Definition) -> Data:
+        column_types = [ClickhouseSchemaConverter.get_column_type(field_type)
+                        for field_type in definition.get_field_types()]
+        encoder = ChRowBinaryEncoder(definition.get_table_fields(), column_types)
+
+        source_filepath = self.get_source_filepath(table_name, sub)
+        data = BinaryData(table_name, source_filepath, encoder.encode, progress_handler=self.progress_handler,
+                          row_filter=self.get_row_filter(table_name))
+        return self.setup_split(data, table_name, sub)
+
+    @staticmethod
+    def get_extension() -> str:
+        return 'rowbinary'
+
+    @staticmethod
+    def get_representation() -> TableRepresentation:
+        return TableRepresentation()
 
     def compose_dump_header(self) -> str:
         return ""
@@ -196,7 +444,7 @@ class PlainCommaConverter(BaseDumpConverter):
             "\"": "\\\""
         }
 
-        return TableRepresentation(quotes="\"", delimiter=",", null_repr="\\N",
+        return TableRepresentation(quotes="\"", date_quotes="", delimiter=",", null_repr="\\N",
                                    row_indent="", row_parentheses=("", ""),
                                    line_ending="\n", line_ending_last="\n", escape=escape)
 
@@ -236,3 +484,107 @@ class PlainTabConverter(BaseDumpConverter):
 
     def compose_dump_footer(self) -> str:
         return ""
+
+
+class ParquetConverter(BaseDumpConverter):
+    """
+    Apache Parquet converter, file per table (requires `pyarrow`)
+    Columns are typed by XSD: integers - int64, xs:date - date32, xs:boolean - bool, the rest - string
+    See: https://parquet.apache.org/docs/file-format/
+    """
+    def __init__(self, source_path: str, schema_path: str):
+        BaseDumpConverter.__init__(self, source_path, schema_path)
+        self.row_group_size = int(os.environ.get("RA_ROW_GROUP_SIZE", "131072"))
+        self.dictionary_ratio = float(os.environ.get("RA_DICTIONARY_RATIO", "0.1"))
+        self.compression = os.environ.get("RA_PARQUET_COMPRESSION", "snappy")
+
+    def get_options(self) -> dict:
+        return BaseDumpConverter.get_options(self) | {
+            'row_group_size': self.row_group_size,
+            'dictionary_ratio': self.dictionary_ratio,
+            'compression': self.compression,
+        }
+
+    def convert_table(self, file, table_name: str, sub: str | None = None):
+        try:
+            import pyarrow  # pylint: disable=import-outside-toplevel
+            import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise MissingDependencyError("Install `pyarrow` to dump into Parquet") from e
+
+        definition = self.get_definition(table_name)
+
+        fields = definition.get_table_fields()
+        types = [self.get_column_type(pyarrow, field_type) for field_type in definition.get_field_types()]
+        schema = pyarrow.schema(list(zip(fields, types)))
+
+        source_filepath = self.get_source_filepath(table_name, sub)
+        data = Data(table_name, source_filepath, None, self.progress_handler,
+                    row_filter=self.get_row_filter(table_name))
+        data = self.setup_source(self.setup_metrics(data, table_name, sub), table_name, sub)
+
+        # Сборка колонок Arrow - стадия `encode`, запись row group - `write`
+        build_array = self.build_array
+        write_batch = self.write_batch
+        if data.metrics is not None:
+            build_array = data.metrics.timed('encode', build_array)
+            write_batch = data.metrics.timed('write', write_batch)
+
+        # Пачка записей - одна row group; в памяти не больше одной пачки
+        start = time.perf_counter()
+        current_row = 0
+        writer = None
+        sink = pyarrow.PythonFile(ByteStream(file), mode='w')
+        for batch in data.iter_batches(definition, self.row_group_size):
+            columns = list(zip(*batch))
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(sink, schema, compression=self.compression,
+                                                       use_dictionary=self.get_dictionary_fields(fields, columns))
+            arrays = [build_array(pyarrow, column, column_type) for column, column_type in zip(columns, types)]
+            write_batch(writer, pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+            current_row += len(batch)
+
+        if writer is None:
+            writer = pyarrow.parquet.ParquetWriter(sink, schema, compression=self.compression)
+        (writer.close if data.metrics is None else data.metrics.timed('write', writer.close))()
+        data.finish_metrics(start, current_row)
+        return data.metrics
+
+    def write_batch(self, writer, batch):
+        writer.write_batch(batch, row_group_size=self.row_group_size)
+
+    def get_dictionary_fields(self, fields: list[str], columns: list[tuple]) -> list[str]:
+        """ Словарное кодирование только для колонок с малым числом различных значений (по первой пачке) """
+        return [field for field, column in zip(fields, columns)
+                if len(set(column)) <= len(column) * self.dictionary_ratio]
+
+    @staticmethod
+    def get_column_type(pyarrow, field_type: dict):
+        if field_type['type'] in ValueRowEncoder.INTEGERS:
+            return pyarrow.int64()
+        if field_type['type'] == 'boolean':
+            return pyarrow.bool_()
+        if field_type['type'] == 'date':
+            return pyarrow.date32()
+        return pyarrow.string()
+
+    @staticmethod
+    def build_array(pyarrow, column: tuple, column_type):
+        if column_type == pyarrow.date32():
+            # Даты приходят строками ISO 8601, разбираются на стороне Arrow
+            return pyarrow.array(column, pyarrow.string()).cast(column_type)
+        return pyarrow.array(column, column_type)
+
+    @staticmethod
+    def get_extension() -> str:
+        return 'parquet'
+
+    @staticmethod
+    def get_representation() -> TableRepresentation:
+        return TableRepresentation()
+
+    def compose_dump_header(self) -> str:
+        return ""
+
+    def compose_dump_footer(self) -> str:
+        return ""
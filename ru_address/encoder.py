@@ -0,0 +1,328 @@
+import datetime
+import re
+import struct
+from ru_address.common import TableRepresentation
+
+
+class RowEncoder:
+    """ Кодировщик строки таблицы, собранный под конкретную пару (набор полей, TableRepresentation).
+    Вместо общего цикла по полям генерируется функция с развернутой обработкой каждого атрибута:
+    одно обращение к атрибуту, подмена NULL/bool через словарь, экранирование только при наличии
+    спецсимволов и сборка строки одним f-string.
+    С описанием типов полей (`field_types`) целые пишутся без кавычек, даты - без экранирования
+    (в `date_quotes`), boolean - литералами `bool_native`; значение, не прошедшее проверку формата,
+    кодируется как строка.
+    С `raw` значения атрибутов и результат - bytes в UTF-8 (см. RawParser): кавычки и разделители
+    добавляются `bytes.join` (одна аллокация), однобайтовые спецсимволы ищутся по коду,
+    экранирование декодирует значение только при их наличии. """
+    def __init__(self, table_fields: list[str], table_representation: TableRepresentation,
+                 field_types: list[dict] | None = None, raw: bool = False):
+        self.table_fields = table_fields
+        self.table_representation = table_representation
+        self.field_types = field_types
+        self.raw = raw
+        self.encode = self._compile()
+
+    def _literal(self, value):
+        """ Константа в кодировке значений """
+        if self.raw and isinstance(value, str):
+            return value.encode('utf-8')
+        return value
+
+    def _compile(self):
+        representation = self.table_representation
+        bool_native = representation.bool_native
+        b = self._literal
+        namespace = {
+            # None - отсутствующий атрибут
+            '_special': {None: b(representation.null_repr),
+                         b('false'): b(representation.bool_repr[0]),
+                         b('true'): b(representation.bool_repr[1])}.get,
+            # С известными типами bool-литералы только у boolean полей, строка 'true' остается строкой
+            '_null': {None: b(representation.null_repr)}.get,
+            '_native': {b('false'): b(bool_native[0]), b('0'): b(bool_native[0]),
+                        b('true'): b(bool_native[1]), b('1'): b(bool_native[1])}.get,
+            '_is_date': re.compile(b(r'\d{4}-\d{2}-\d{2}'), re.ASCII).fullmatch,
+            '_escape': representation.escape,
+            '_q': b(representation.quotes),
+            '_dq': b(representation.date_quotes),
+            # `v.join(_q_pair)` - значение в кавычках
+            '_q_pair': (b(representation.quotes),) * 2,
+            '_dq_pair': (b(representation.date_quotes),) * 2,
+            '_start': representation.row_indent + representation.row_parentheses[0],
+            '_delimiter': representation.delimiter,
+            '_end': representation.row_parentheses[1],
+        }
+        if self.raw and representation.escape:
+            table = representation.escape
+
+            def escape(value: bytes) -> bytes:
+                return value.decode('utf-8').translate(table).encode('utf-8')
+            namespace['_escape'] = escape
+
+        lines = ['def encode(get):']
+        for i, field in enumerate(self.table_fields):
+            lines.append(f'    v{i} = get({b(field)!r})')
+            kind = self._get_kind(i)
+            if kind == 'integer':
+                lines.append(f'    if v{i} is not None and v{i}.isdigit() and v{i}.isascii():')
+                lines.append(f'        r{i} = v{i}')
+                lines.append('    else:')
+                lines.extend(self._compile_string(i, '        '))
+            elif kind == 'date':
+                lines.append(f'    if v{i} is not None and _is_date(v{i}):')
+                lines.append(f'        r{i} = {self._compile_quoted(i, "_dq")}')
+                lines.append('    else:')
+                lines.extend(self._compile_string(i, '        '))
+            elif kind == 'boolean':
+                lines.append(f'    r{i} = _native(v{i})')
+                lines.append(f'    if r{i} is None:')
+                lines.extend(self._compile_string(i, '        '))
+            else:
+                lines.extend(self._compile_string(i, '    '))
+        if self.raw:
+            namespace['_delimiter'] = b(representation.delimiter)
+            namespace['_ends'] = (b(namespace['_start']), b(namespace['_end']))
+            values = ''.join(f'r{i}, ' for i in range(len(self.table_fields)))
+            lines.append(f'    return _delimiter.join(({values})).join(_ends)')
+        else:
+            values = '{_delimiter}'.join(f'{{r{i}}}' for i in range(len(self.table_fields)))
+            lines.append(f'    return f"{{_start}}{values}{{_end}}"')
+
+        exec('\n'.join(lines), namespace)  # pylint: disable=exec-used
+        return namespace['encode']
+
+    def _get_kind(self, i: int) -> str | None:
+        if self.field_types is None:
+            return None
+        field_type = self.field_types[i]['type']
+        if field_type in ValueRowEncoder.INTEGERS:
+            return 'integer'
+        if field_type in ('date', 'boolean'):
+            return field_type
+        return None
+
+    def _compile_string(self, i: int, indent: str) -> list[str]:
+        """ Значение как строка: NULL/bool через словарь, экранирование и кавычки """
+        representation = self.table_representation
+        # Проверка `in` для нескольких символов заметно дешевле безусловного str.translate
+        escape_chars = [self._literal(chr(char)) for char in representation.escape or {}]
+        if self.raw:
+            # `int in bytes` - поиск байта, заметно быстрее `bytes in bytes`
+            escape_chars = [char[0] if len(char) == 1 else char for char in escape_chars]
+
+        special = '_special' if self.field_types is None else '_null'
+        lines = [f'{indent}r{i} = {special}(v{i})',
+                 f'{indent}if r{i} is None:']
+        if escape_chars:
+            lines.append(f'{indent}    if {" or ".join(f"{char!r} in v{i}" for char in escape_chars)}:')
+            escaped = f'_escape(v{i})' if self.raw else f'v{i}.translate(_escape)'
+            lines.append(f'{indent}        v{i} = {escaped}')
+        if representation.quotes:
+            lines.append(f'{indent}    r{i} = {self._compile_quoted(i, "_q")}')
+        else:
+            lines.append(f'{indent}    r{i} = v{i}')
+        return lines
+
+    def _compile_quoted(self, i: int, quotes: str) -> str:
+        if self.raw:
+            return f'v{i}.join({quotes}_pair)'
+        return f'f"{{{quotes}}}{{v{i}}}{{{quotes}}}"'
+
+
+class PgBinaryRowEncoder:
+    """ Кодировщик строки в кортеж бинарного формата PostgreSQL COPY.
+    Каждое поле - длина (int32, -1 для NULL) и значение в сетевом порядке байт;
+    способ кодирования выбирается по типу колонки (smallint/integer/bigint, date, boolean, остальное - текст).
+    See: https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4 """
+    SIGNATURE = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+    TRAILER = struct.pack('>h', -1)
+
+    # Дни отсчитываются от 2000-01-01
+    EPOCH = datetime.date(2000, 1, 1).toordinal()
+
+    # Размер значения и упаковка вместе с длиной одним вызовом
+    INTEGERS = {
+        'smallint': (2, struct.Struct('>ih').pack),
+        'integer': (4, struct.Struct('>ii').pack),
+        'bigint': (8, struct.Struct('>iq').pack),
+    }
+
+    def __init__(self, table_fields: list[str], column_types: list[str]):
+        self.table_fields = table_fields
+        self.column_types = column_types
+        self.encode = self._compile()
+
+    def _compile(self):
+        date = struct.Struct('>ii').pack
+        dates = {}
+
+        def encode_date(value):
+            # Дат в выгрузке немного, каждая разбирается один раз
+            if value not in dates:
+                dates[value] = date(4, datetime.date.fromisoformat(value).toordinal() - PgBinaryRowEncoder.EPOCH)
+            return dates[value]
+
+        true, false = struct.pack('>ib', 1, 1), struct.pack('>ib', 1, 0)
+        namespace = {
+            '_count': struct.pack('>h', len(self.table_fields)),
+            '_null': struct.pack('>i', -1),
+            '_length': struct.Struct('>i').pack,
+            '_date': encode_date,
+            '_bool': {'true': true, '1': true, 'false': false, '0': false}.__getitem__,
+        }
+        namespace.update({f'_{name}': pack for name, (_, pack) in PgBinaryRowEncoder.INTEGERS.items()})
+
+        lines = ['def encode(get):']
+        for i, (field, column_type) in enumerate(zip(self.table_fields, self.column_types)):
+            lines.append(f'    v{i} = get({field!r})')
+            lines.append(f'    if v{i} is None:')
+            lines.append(f'        p{i} = _null')
+            lines.append('    else:')
+            if column_type in PgBinaryRowEncoder.INTEGERS:
+                size = PgBinaryRowEncoder.INTEGERS[column_type][0]
+                lines.append(f'        p{i} = _{column_type}({size}, int(v{i}))')
+            elif column_type == 'date':
+                lines.append(f'        p{i} = _date(v{i})')
+            elif column_type == 'boolean':
+                lines.append(f'        p{i} = _bool(v{i})')
+            else:
+                lines.append(f'        v{i} = v{i}.encode()')
+                lines.append(f'        p{i} = _length(len(v{i})) + v{i}')
+        values = ', '.join(f'p{i}' for i in range(len(self.table_fields)))
+        lines.append(f'    return b"".join((_count, {values}))')
+
+        exec('\n'.join(lines), namespace)  # pylint: disable=exec-used
+        return namespace['encode']
+
+
+class ValueRowEncoder:
+    """ Строка таблицы как кортеж значений Python для DB-API: целые - int, boolean - bool,
+    остальное (строки, даты) - str как есть, отсутствующий атрибут - None.
+    С `dates` xs:date - datetime.date; с `row_type` строка создается им из значений (например, namedtuple). """
+    INTEGERS = ('integer', 'int', 'long', 'short', 'byte')
+
+    def __init__(self, table_fields: list[str], field_types: list[dict], dates: bool = False, row_type=None):
+        self.table_fields = table_fields
+        self.field_types = field_types
+        self.dates = dates
+        self.row_type = row_type
+        self.encode = self._compile()
+
+    def _compile(self):
+        namespace = {
+            '_bool': {'true': True, '1': True, 'false': False, '0': False}.__getitem__,
+            '_date': datetime.date.fromisoformat,
+            '_row': self.row_type,
+        }
+
+        lines = ['def encode(get):']
+        for i, (field, field_type) in enumerate(zip(self.table_fields, self.field_types)):
+            lines.append(f'    v{i} = get({field!r})')
+            if field_type['type'] in ValueRowEncoder.INTEGERS:
+                lines.append(f'    if v{i} is not None:')
+                lines.append(f'        v{i} = int(v{i})')
+            elif field_type['type'] == 'boolean':
+                lines.append(f'    if v{i} is not None:')
+                lines.append(f'        v{i} = _bool(v{i})')
+            elif field_type['type'] == 'date' and self.dates:
+                lines.append(f'    if v{i} is not None:')
+                lines.append(f'        v{i} = _date(v{i})')
+        values = ''.join(f'v{i}, ' for i in range(len(self.table_fields)))
+        lines.append(f'    return ({values})' if self.row_type is None else f'    return _row({values})')
+
+        exec('\n'.join(lines), namespace)  # pylint: disable=exec-used
+        return namespace['encode']
+
+
+class ChRowBinaryEncoder:
+    """ Кодировщик строки в формат ClickHouse RowBinary: значения подряд в порядке колонок,
+    целые little-endian, String - длина (LEB128) и байты, Date - дни от 1970-01-01 (UInt16),
+    Nullable - байт-признак NULL перед значением. Отсутствующее значение обязательной колонки
+    записывается значением типа по умолчанию, как при `input_format_null_as_default`.
+    See: https://clickhouse.com/docs/en/interfaces/formats#rowbinary """
+    INTEGERS = {
+        'Int8': '<b',
+        'Int16': '<h',
+        'Int32': '<i',
+        'Int64': '<q',
+    }
+
+    EPOCH = datetime.date(1970, 1, 1).toordinal()
+
+    def __init__(self, table_fields: list[str], column_types: list[str]):
+        self.table_fields = table_fields
+        self.column_types = column_types
+        self.encode = self._compile()
+
+    @staticmethod
+    def _varint(size: int) -> bytes:
+        result = bytearray()
+        while size >= 0x80:
+            result.append(size & 0x7f | 0x80)
+            size >>= 7
+        result.append(size)
+        return bytes(result)
+
+    @staticmethod
+    def _compile_date(prefix: bytes):
+        pack = struct.Struct('<H').pack
+        dates = {}
+
+        def encode_date(value):
+            # Date хранит 1970-01-01...2149-06-06, значения вне диапазона насыщаются, как при разборе текста
+            if value not in dates:
+                days = datetime.date.fromisoformat(value).toordinal() - ChRowBinaryEncoder.EPOCH
+                dates[value] = prefix + pack(min(max(days, 0), 0xffff))
+            return dates[value]
+        return encode_date
+
+    def _compile(self):
+        namespace = {
+            '_null': b'\x01',
+            '_varint': ChRowBinaryEncoder._varint,
+            # Короткие строки - почти все значения, их длины кодируются таблицей
+            '_lengths': [ChRowBinaryEncoder._varint(size) for size in range(0x80)],
+            '_nlengths': [b'\x00' + ChRowBinaryEncoder._varint(size) for size in range(0x80)],
+            '_date': ChRowBinaryEncoder._compile_date(b''),
+            '_ndate': ChRowBinaryEncoder._compile_date(b'\x00'),
+            '_bool': {'true': b'\x01', '1': b'\x01', 'false': b'\x00', '0': b'\x00'}.__getitem__,
+            '_nbool': {'true': b'\x00\x01', '1': b'\x00\x01', 'false': b'\x00\x00', '0': b'\x00\x00'}.__getitem__,
+        }
+        for name, fmt in ChRowBinaryEncoder.INTEGERS.items():
+            namespace[f'_{name}'] = struct.Struct(fmt).pack
+            namespace[f'_n{name}'] = struct.Struct(f'<B{fmt[1:]}').pack
+            namespace[f'_default_{name}'] = struct.pack(fmt, 0)
+        namespace['_default_String'] = b'\x00'
+        namespace['_default_Date'] = struct.pack('<H', 0)
+        namespace['_default_Bool'] = b'\x00'
+
+        lines = ['def encode(get):']
+        for i, (field, column_type) in enumerate(zip(self.table_fields, self.column_types)):
+            nullable = column_type.startswith('Nullable(')
+            if nullable:
+                column_type = column_type[len('Nullable('):-1]
+            n = 'n' if nullable else ''
+            lines.append(f'    v{i} = get({field!r})')
+            lines.append(f'    if v{i} is None:')
+            lines.append(f'        p{i} = {"_null" if nullable else f"_default_{column_type}"}')
+            lines.append('    else:')
+            if column_type in ChRowBinaryEncoder.INTEGERS:
+                args = f'0, int(v{i})' if nullable else f'int(v{i})'
+                lines.append(f'        p{i} = _{n}{column_type}({args})')
+            elif column_type == 'Date':
+                lines.append(f'        p{i} = _{n}date(v{i})')
+            elif column_type == 'Bool':
+                lines.append(f'        p{i} = _{n}bool(v{i})')
+            else:
+                lines.append(f'        v{i} = v{i}.encode()')
+                lines.append(f'        if len(v{i}) < 0x80:')
+                lines.append(f'            p{i} = _{n}lengths[len(v{i})] + v{i}')
+                lines.append('        else:')
+                prefix = "b'\\x00' + " if nullable else ''
+                lines.append(f'            p{i} = {prefix}_varint(len(v{i})) + v{i}')
+        values = ', '.join(f'p{i}' for i in range(len(self.table_fields)))
+        lines.append(f'    return b"".join(({values},))')
+
+        exec('\n'.join(lines), namespace)  # pylint: disable=exec-used
+        return namespace['encode']
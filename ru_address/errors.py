@@ -8,3 +8,19 @@ class UnknownPlatformError(ApplicationError):
 
 class DefinitionError(ApplicationError):
     """ Ошибка при парсинге схемы таблицы """
+
+
+class FilterError(ApplicationError):
+    """ Ошибка в условии отбора записей """
+
+
+class DriverError(ApplicationError):
+    """ Ошибка при подключении к БД """
+
+
+class MissingDependencyError(ApplicationError):
+    """ Ошибка при отсутствии необязательного пакета, нужного для выбранного формата """
+
+
+class SourceError(ApplicationError):
+    """ Ошибка в параметрах чтения таблицы: неизвестная таблица, регион, колонки """
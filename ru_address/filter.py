@@ -0,0 +1,106 @@
+import re
+import datetime
+from ru_address.encoder import ValueRowEncoder
+from ru_address.errors import FilterError
+
+
+class RowFilter:
+    """ Отбор записей по условиям на атрибуты (``dump --where``): ``ISACTUAL=1``, ``ENDDATE>today``,
+    ``HOUSES.HOUSETYPE!=2``, диапазон дат ``UPDATEDATE=2023-01-01..2023-12-31``.
+    Условия объединяются по И; к таблице применяются только условия на ее поля (и с ее именем в префиксе).
+    Значения сравниваются по типу поля из XSD: целые - как числа, даты - как ISO строки, boolean - true/1, false/0.
+    Запись без атрибута условию не удовлетворяет.
+    Под каждую таблицу генерируется функция-предикат от `get` записи, как у RowEncoder,
+    отброшенная запись не кодируется вовсе; вариант для записей в bytes (RawParser) - в ее атрибуте `raw`. """
+    PATTERN = re.compile(r'\s*(?:(\w+)\.)?(\w+)\s*(!=|<=|>=|==|=|<|>)\s*(.*?)\s*')
+    OPERATORS = {'=': '==', '==': '==', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+
+    def __init__(self, expressions: list[str]):
+        self.expressions = list(expressions)
+        self.conditions = [RowFilter.parse(expression) for expression in self.expressions]
+
+    @staticmethod
+    def parse(expression: str) -> tuple[str | None, str, str, str]:
+        """ Условие `[TABLE.]FIELD<op>VALUE` -> (таблица, поле, оператор Python, значение) """
+        match = RowFilter.PATTERN.fullmatch(expression)
+        if match is None or match.group(4) == '':
+            raise FilterError(f"Can't parse filter `{expression}`, expected FIELD=VALUE, FIELD>VALUE etc")
+        table_name, field, operator, value = match.groups()
+        if operator in ('=', '==') and '..' in value:
+            if value.count('..') != 1 or '' in value.split('..'):
+                raise FilterError(f"Range in `{expression}` must look like FROM..TO")
+            operator = '..'
+        return table_name, field, RowFilter.OPERATORS.get(operator, operator), value
+
+    def get_fields(self) -> set[str]:
+        return {field for _, field, _, _ in self.conditions}
+
+    def get_table_fields(self) -> set[tuple[str | None, str]]:
+        """ Пары (таблица из префикса или None, поле) """
+        return {(table_name, field) for table_name, field, _, _ in self.conditions}
+
+    def get_tables(self) -> set[str]:
+        return {table_name for table_name, _, _, _ in self.conditions if table_name is not None}
+
+    def compile(self, table_name: str, table_fields: list[str], field_types: list[dict]):
+        """ Предикат `accept(get) -> bool` для таблицы, None - условий на ее поля нет """
+        accept = self._compile(table_name, table_fields, field_types, str)
+        if accept is not None:
+            accept.raw = self._compile(table_name, table_fields, field_types, RowFilter._bytes)
+        return accept
+
+    def _compile(self, table_name: str, table_fields: list[str], field_types: list[dict], literal):
+        """ `literal` - представление строковых констант: str или bytes в UTF-8 """
+        types = dict(zip(table_fields, field_types))
+        lines = ['def accept(get):']
+        for i, (table, field, operator, value) in enumerate(self.conditions):
+            if field not in types or table not in (None, table_name):
+                continue
+            condition = self._compile_condition(i, types[field], operator, value, literal)
+            lines.append(f'    v{i} = get({literal(field)!r})')
+            lines.append(f'    if v{i} is None or not ({condition}):')
+            lines.append('        return False')
+        if len(lines) == 1:
+            return None
+        lines.append('    return True')
+
+        namespace = {}
+        exec('\n'.join(lines), namespace)  # pylint: disable=exec-used
+        return namespace['accept']
+
+    @staticmethod
+    def _bytes(value: str) -> bytes:
+        return value.encode('utf-8')
+
+    def _compile_condition(self, i: int, field_type: dict, operator: str, value: str, literal) -> str:
+        kind = field_type['type']
+        if operator == '..':
+            low, high = value.split('..')
+            return (f'{self._compile_condition(i, field_type, ">=", low, literal)} and '
+                    f'{self._compile_condition(i, field_type, "<=", high, literal)}')
+
+        if kind in ValueRowEncoder.INTEGERS:
+            number = self._parse(int, value, kind)
+            if operator in ('==', '!='):
+                # Целые в выгрузке записаны без ведущих нулей, сравниваем строки без int()
+                return f'v{i} {operator} {literal(str(number))!r}'
+            return f'v{i}.isdigit() and int(v{i}) {operator} {number!r}'
+        if kind == 'boolean':
+            flag = {'true': True, '1': True, 'false': False, '0': False}.get(value.lower())
+            if flag is None or operator not in ('==', '!='):
+                raise FilterError(f"Boolean filter must be `=true`, `=false`, `!=true` or `!=false`, got `{value}`")
+            literals = tuple(map(literal, ('true', '1') if flag else ('false', '0')))
+            return f'v{i} {"in" if operator == "==" else "not in"} {literals!r}'
+        if kind == 'date':
+            # ISO даты упорядочены так же, как строки
+            if value.lower() == 'today':
+                value = datetime.date.today().isoformat()
+            value = self._parse(datetime.date.fromisoformat, value, kind).isoformat()
+        return f'v{i} {operator} {literal(value)!r}'
+
+    @staticmethod
+    def _parse(parser, value: str, kind: str):
+        try:
+            return parser(value)
+        except ValueError as e:
+            raise FilterError(f"Value `{value}` doesn't match field type `{kind}`") from e
@@ -5,13 +5,29 @@ from ru_address import package_directory
 
 class Index:
     """ Генерация минимального набора ключей под разные платформы """
+    index_file = os.path.join(package_directory, 'resources', 'index.xml')
+    _index_tree = None
+
     def __init__(self, stylesheet_file):
         self.stylesheet_file = stylesheet_file
-        self.index_file = os.path.join(package_directory, 'resources', 'index.xml')
-        self.index_tree = et.parse(self.index_file)
+        self.index_tree = Index.get_index_tree()
+        self._transform = None
+
+    @staticmethod
+    def get_index_tree():
+        # Описание ключей общее для всех платформ, читается один раз
+        if Index._index_tree is None:
+            Index._index_tree = et.parse(Index.index_file)
+        return Index._index_tree
+
+    @staticmethod
+    def get_primary_keys(table_name) -> list[str]:
+        """ Поля первичного ключа таблицы """
+        return Index.get_index_tree().xpath('/database/table[@id=$table_name]/primary-key/@field',
+                                            table_name=table_name)
 
     def build(self, table_name):
-        stylesheet = et.parse(self.stylesheet_file)
-        transform = et.XSLT(stylesheet)
-        result = transform(self.index_tree, table_name=transform.strparam(table_name))
+        if self._transform is None:
+            self._transform = et.XSLT(et.parse(self.stylesheet_file))
+        result = self._transform(self.index_tree, table_name=self._transform.strparam(table_name))
         return str(result)
@@ -0,0 +1,150 @@
+import os
+import json
+import zlib
+
+
+class Manifest:
+    """ Журнал хода дампа для продолжения после сбоя (``dump --resume``).
+    Записи дописываются построчно в JSON по мере готовности частей целевых файлов: заголовок файла,
+    каждая единица работы (таблица региона) с размером и временем изменения исходного файла, завершение файла.
+    Для части хранится смещение ее конца и CRC32 ее байтов (считается при записи, см. ``BlockWriter.checkpoint``):
+    при продолжении части сверяются с содержимым целевого файла, недописанный хвост отбрасывается.
+    Оборванная при сбое последняя строка журнала игнорируется. Журнал ведется только при запуске с ``--resume``,
+    без него записи не сохраняются. """
+    FILENAME = '.ru_address.manifest'
+    READ_SIZE = 1024 * 1024
+
+    def __init__(self, path: str, options: dict, resume: bool = False):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        self.options = options
+        self.files = {}
+        self._journal = None
+        if not resume:
+            return
+        if os.path.exists(path) and self._replay():
+            self._journal = open(path, 'a', encoding='utf-8')
+        else:
+            self.files = {}
+            self._journal = open(path, 'w', encoding='utf-8')
+            self._append({'options': options})
+
+    @staticmethod
+    def unit_key(table_name: str, region: str | None) -> str:
+        return table_name if region is None else f'{table_name}/{region}'
+
+    def is_complete(self, path: str, sources: dict) -> bool:
+        """ Файл дописан предыдущим запуском, не изменялся после и собран из тех же исходных файлов """
+        complete = self._entry(path)['complete']
+        if complete is None or not os.path.exists(path) or complete['sources'] != sources:
+            return False
+        stat = os.stat(path)
+        return complete['size'] == stat.st_size and complete['mtime_ns'] == stat.st_mtime_ns
+
+    def verify_segments(self, path: str, sources: list[tuple[str, list]]) -> tuple[int, int]:
+        """ Сколько первых частей файла (заголовок и единицы работы по порядку ``sources``) дописаны полностью
+        и совпадают с журналом; возвращает их число и смещение конца последней из них """
+        segments = self._entry(path)['segments']
+        if not segments or not os.path.exists(path):
+            return 0, 0
+        expected = [('header', None)] + sources
+        verified, offset = 0, 0
+        with open(path, 'rb') as f:
+            for segment, (key, source) in zip(segments, expected):
+                if segment['segment'] != key or segment.get('source') != source:
+                    break
+                if Manifest.checksum(f, offset, segment['end']) != segment['crc']:
+                    break
+                verified, offset = verified + 1, segment['end']
+        return verified, offset
+
+    def is_part_ready(self, path: str, index: int, part_path: str, key: str, source: list) -> bool:
+        """ Часть файла (параллельный дамп) сконвертирована предыдущим запуском из того же исходного файла """
+        part = self._entry(path)['parts'].get(index)
+        if part is None or part['unit'] != key or part['source'] != source:
+            return False
+        if not os.path.exists(part_path) or os.path.getsize(part_path) != part['size']:
+            return False
+        with open(part_path, 'rb') as f:
+            return Manifest.checksum(f, 0, part['size']) == part['crc']
+
+    def start_file(self, path: str, offset: int = 0):
+        """ Файл дописывается с ``offset``: части за ним недействительны """
+        self._append({'file': self._relpath(path), 'truncate': offset})
+
+    def segment_done(self, path: str, key: str, source: list | None, end: int, crc: int):
+        self._append({'file': self._relpath(path), 'segment': key, 'source': source, 'end': end, 'crc': crc})
+
+    def part_done(self, path: str, index: int, key: str, source: list, size: int, crc: int):
+        self._append({'file': self._relpath(path), 'part': index, 'unit': key, 'source': source,
+                      'size': size, 'crc': crc})
+
+    def file_done(self, path: str, sources: dict):
+        if self._journal is None:
+            return
+        stat = os.stat(path)
+        self._append({'file': self._relpath(path), 'complete': True, 'sources': sources,
+                      'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+
+    @staticmethod
+    def checksum(f, start: int, end: int) -> int:
+        crc = 0
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(Manifest.READ_SIZE, remaining))
+            if not block:
+                return -1
+            crc = zlib.crc32(block, crc)
+            remaining -= len(block)
+        return crc
+
+    def _replay(self) -> bool:
+        """ Восстанавливает состояние из журнала; False - журнал от запуска с другими параметрами """
+        with open(self.path, encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return False
+        if header.get('options') != self.options:
+            return False
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Строка не дописана при сбое
+                continue
+            self._apply(record)
+        return True
+
+    def _entry(self, path: str) -> dict:
+        return self.files.get(self._relpath(path), {'segments': [], 'parts': {}, 'complete': None})
+
+    def _append(self, record: dict):
+        if self._journal is None:
+            return
+        if 'file' in record:
+            self._apply(record)
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+
+    def _apply(self, record: dict):
+        entry = self.files.setdefault(record['file'], {'segments': [], 'parts': {}, 'complete': None})
+        if 'truncate' in record:
+            entry['segments'] = [s for s in entry['segments'] if s['end'] <= record['truncate']]
+            entry['complete'] = None
+        elif 'segment' in record:
+            entry['segments'].append(record)
+        elif 'part' in record:
+            entry['parts'][record['part']] = record
+            entry['complete'] = None
+        elif 'complete' in record:
+            entry['complete'] = record
+
+    def _relpath(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root)
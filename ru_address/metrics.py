@@ -0,0 +1,152 @@
+import json
+import os
+import time
+import psutil
+
+
+class UnitMetrics:
+    """ Метрики единицы работы дампа (таблицы региона): записи, байты и время по стадиям.
+    `parse` - чтение XML и отбор записей, `encode` - сборка строк целевого формата, `write` - запись и сжатие.
+    При разборе файла частями (`--split-jobs`) время `parse` и `encode` - суммарное по процессам-обработчикам. """
+    STAGES = ('parse', 'encode', 'write')
+
+    def __init__(self, table_name: str, region: str | None = None):
+        self.table_name = table_name
+        self.region = region
+        self.path = None
+        self.rows_read = 0
+        self.rows_written = 0
+        self.source_bytes = 0
+        self.output_bytes = 0
+        self.stages = dict.fromkeys(UnitMetrics.STAGES, 0.0)
+        self.seconds = 0.0
+        # RSS процесса, конвертировавшего единицу, сразу после нее
+        self.rss = 0
+
+    def timed(self, stage: str, func):
+        """ `func` с учетом времени вызовов в стадии `stage` """
+        stages = self.stages
+        counter = time.perf_counter
+
+        def wrapper(*args):
+            start = counter()
+            result = func(*args)
+            stages[stage] += counter() - start
+            return result
+        return wrapper
+
+    def call(self, stage: str, func, *args):
+        """ Вызов после конвертации (сброс буфера, закрытие файла): время идет в стадию и в общее время единицы """
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        self.stages[stage] += elapsed
+        self.seconds += elapsed
+        return result
+
+    def add(self, stages: dict):
+        for stage, seconds in stages.items():
+            self.stages[stage] += seconds
+
+    def sample_rss(self):
+        self.rss = psutil.Process(os.getpid()).memory_info().rss
+
+    def to_dict(self) -> dict:
+        return {
+            'table': self.table_name,
+            'region': self.region,
+            'path': self.path,
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'source_bytes': self.source_bytes,
+            'output_bytes': self.output_bytes,
+            'seconds': round(self.seconds, 6),
+            'stages': {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+            'rss': self.rss,
+        }
+
+
+class MetricsReport:
+    """ Отчет о запуске дампа: метрики по единицам работы, итоги и пиковый RSS.
+    Пишется в JSON и/или в textfile для node_exporter (Prometheus), оба файла - через временный и переименование. """
+    PREFIX = 'ru_address_dump'
+
+    def __init__(self, options: dict | None = None):
+        self.options = options or {}
+        self.units = []
+        self.started = time.time()
+        self.seconds = 0.0
+        # Пиковый RSS по замерам: в конце каждой единицы работы (и в процессах-обработчиках) и в конце дампа
+        self.peak_rss = 0
+
+    def add(self, unit: UnitMetrics):
+        self.units.append(unit)
+        self.peak_rss = max(self.peak_rss, unit.rss)
+
+    def finish(self):
+        self.seconds = time.time() - self.started
+        self.peak_rss = max(self.peak_rss, psutil.Process(os.getpid()).memory_info().rss)
+
+    def get_totals(self) -> dict:
+        totals = {key: sum(getattr(unit, key) for unit in self.units)
+                  for key in ('rows_read', 'rows_written', 'source_bytes', 'output_bytes')}
+        totals['stages'] = {stage: round(sum(unit.stages[stage] for unit in self.units), 6)
+                            for stage in UnitMetrics.STAGES}
+        return totals
+
+    def to_dict(self) -> dict:
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.started)),
+            'seconds': round(self.seconds, 6),
+            'peak_rss': self.peak_rss,
+            'options': self.options,
+            'totals': self.get_totals(),
+            'units': [unit.to_dict() for unit in self.units],
+        }
+
+    def write_json(self, path: str):
+        MetricsReport._write_atomic(path, json.dumps(self.to_dict(), indent=1, ensure_ascii=False) + '\n')
+
+    def write_textfile(self, path: str):
+        """ Формат textfile collector: https://github.com/prometheus/node_exporter#textfile-collector """
+        prefix = MetricsReport.PREFIX
+        lines = []
+
+        def metric(name: str, kind: str, description: str, samples: list[tuple[dict, float]]):
+            lines.append(f'# HELP {prefix}_{name} {description}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for labels, value in samples:
+                label_query = ','.join(f'{key}="{MetricsReport._escape_label(label)}"'
+                                       for key, label in labels.items())
+                lines.append(f'{prefix}_{name}{{{label_query}}} {value}' if labels else f'{prefix}_{name} {value}')
+
+        units = [({'table': unit.table_name, 'region': unit.region or ''}, unit) for unit in self.units]
+        metric('rows_read', 'gauge', 'Source records read',
+               [(labels, unit.rows_read) for labels, unit in units])
+        metric('rows_written', 'gauge', 'Records written to the dump',
+               [(labels, unit.rows_written) for labels, unit in units])
+        metric('source_bytes', 'gauge', 'Size of the source XML file',
+               [(labels, unit.source_bytes) for labels, unit in units])
+        metric('output_bytes', 'gauge', 'Bytes written to the dump',
+               [(labels, unit.output_bytes) for labels, unit in units])
+        metric('stage_seconds', 'gauge', 'Time spent per pipeline stage',
+               [(labels | {'stage': stage}, round(unit.stages[stage], 6))
+                for labels, unit in units for stage in UnitMetrics.STAGES])
+        metric('unit_seconds', 'gauge', 'Wall time of the table conversion',
+               [(labels, round(unit.seconds, 6)) for labels, unit in units])
+        metric('duration_seconds', 'gauge', 'Wall time of the dump run', [({}, round(self.seconds, 6))])
+        metric('peak_rss_bytes', 'gauge', 'Peak resident set size (sampled)', [({}, self.peak_rss)])
+        metric('last_run_timestamp_seconds', 'gauge', 'Start time of the dump run', [({}, round(self.started))])
+        MetricsReport._write_atomic(path, '\n'.join(lines) + '\n')
+
+    @staticmethod
+    def _escape_label(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @staticmethod
+    def _write_atomic(path: str, content: str):
+        # node_exporter не должен прочитать недописанный файл
+        temp_file = f'{path}.{os.getpid()}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_file, path)
@@ -1,9 +1,14 @@
 import os
+import multiprocessing
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from ru_address.core import Core
-from ru_address.common import Common
+from ru_address.common import Common, ProgressCounter
 from ru_address.dump import BaseDumpConverter
 from ru_address.errors import UnknownPlatformError
+from ru_address.manifest import Manifest
+from ru_address.metrics import MetricsReport, UnitMetrics
+from ru_address.writer import BaseCodec, BlockWriter
 
 
 class OutputRegistry:
@@ -13,11 +18,12 @@ class OutputRegistry:
         return available.get(alias, None)
 
     @staticmethod
-    def init_output(alias: str, converter: BaseDumpConverter, output_path: str, include_meta: bool):
+    def init_output(alias: str, converter: BaseDumpConverter, output_path: str, include_meta: bool, jobs: int = 1,
+                    codec: BaseCodec | None = None):
         _output = OutputRegistry.get_output(alias)
         if _output is None:
             raise UnknownPlatformError()
-        return _output(converter, output_path, include_meta)
+        return _output(converter, output_path, include_meta, jobs, codec)
 
     @staticmethod
     def get_available_modes() -> dict:
@@ -33,157 +39,376 @@ class OutputRegistry:
         return list(OutputRegistry.get_available_modes().keys())
 
 
+class DumpUnit:
+    """ Единица работы: данные одной таблицы (одного региона) в рамках целевого файла """
+    def __init__(self, table_name: str, region: str | None = None, separator: bool = True):
+        self.table_name = table_name
+        self.region = region
+        self.separator = separator
+
+    def __str__(self):
+        if self.region is not None:
+            return f'table `{self.table_name}`, region `{self.region}`'
+        return f'table `{self.table_name}`'
+
+
+class DumpFile:
+    """ Целевой файл дампа, собирается из последовательности единиц работы """
+    def __init__(self, path: str, units: list[DumpUnit]):
+        self.path = path
+        self.units = units
+
+
 class BaseOutput(ABC):
-    def __init__(self, converter: BaseDumpConverter, output_path: str, include_meta: bool = True):
+    def __init__(self, converter: BaseDumpConverter, output_path: str, include_meta: bool = True, jobs: int = 1,
+                 codec: BaseCodec | None = None):
         self.converter = converter
         self.output_path = output_path
         self.include_meta = include_meta
+        self.jobs = jobs
+        self.codec = codec
+        # Потоки сжатия делятся между процессами-обработчиками
+        self.compress_threads = int(os.environ.get("RA_COMPRESS_THREADS", max(1, (os.cpu_count() or 1) // jobs)))
+        # Продолжить прерванный дамп / пропустить неизмененное по журналу предыдущего запуска
+        self.resume = False
+        self.source_hash = os.environ.get("RA_SOURCE_HASH", "0") == "1"
+        self.files_skipped = 0
+        self._fingerprints = {}
+        self.bytes_written = 0
+        self.flush_count = 0
+        # Отчет с метриками по единицам работы (`--metrics`), None - метрики не собираются
+        self.metrics: MetricsReport | None = None
 
     @abstractmethod
+    def plan(self, tables: list[str], regions: list[str]) -> list[DumpFile]:
+        """ Список целевых файлов в порядке записи """
+
     def write(self, tables: list[str], regions: list[str]):
-        pass
+        dump_files = self.plan(tables, regions)
+        self.converter.collect_metrics = self.metrics is not None
+        manifest = Manifest(self.get_manifest_path(), self.get_manifest_options(), self.resume)
+        try:
+            if self.jobs > 1:
+                self._write_parallel(dump_files, manifest)
+            else:
+                self._write_serial(dump_files, manifest)
+        finally:
+            manifest.close()
+        if self.metrics is not None:
+            self.metrics.finish()
+        if self.resume:
+            Common.cli_output(f'Skipped {self.files_skipped} of {len(dump_files)} files with unchanged sources')
+        Common.cli_output(f'Written {self.bytes_written} bytes in {self.flush_count} block writes')
+
+    def get_extension(self) -> str:
+        if self.codec is None:
+            return self.converter.get_extension()
+        return f'{self.converter.get_extension()}.{self.codec.get_extension()}'
+
+    def open_writer(self, path: str, offset: int = 0, checksum: bool = False) -> BlockWriter:
+        return BlockWriter(path, codec=self.codec, threads=self.compress_threads, offset=offset, checksum=checksum)
+
+    def get_manifest_path(self) -> str:
+        return os.path.join(self.output_path, Manifest.FILENAME)
+
+    def get_manifest_options(self) -> dict:
+        """ Параметры, от которых зависит содержимое дампа: журнал с другими параметрами не продолжается """
+        return {
+            'target': type(self.converter).__name__,
+            'mode': type(self).__name__,
+            'codec': None if self.codec is None else [self.codec.get_extension(), self.codec.level],
+            'meta': self.include_meta,
+            'source_hash': self.source_hash,
+            'converter': self.converter.get_options(),
+        }
+
+    def get_unit_sources(self, dump_file: DumpFile) -> list[tuple[str, list]]:
+        """ Ключи единиц работы файла и отпечатки их исходных файлов (XML данных и XSD схемы) """
+        sources = []
+        for unit in dump_file.units:
+            source_filepaths = self.converter.get_source_filepaths(unit.table_name, unit.region)
+            schema_filepath = Common.get_source_filepath(
+                Core.get_schema_path(unit.table_name, self.converter.schema_path),
+                Core.get_all_tables()[unit.table_name], 'xsd')
+            sources.append((Manifest.unit_key(unit.table_name, unit.region),
+                            [self.get_fingerprint(filepath) for filepath in source_filepaths]
+                            + [self.get_fingerprint(schema_filepath)]))
+        return sources
+
+    def get_fingerprint(self, filepath: str) -> list:
+        """ Имя, размер и время изменения файла; с ``RA_SOURCE_HASH`` - размер и CRC32 содержимого,
+        так неизмененные таблицы новой выгрузки совпадают несмотря на новые имена и даты файлов """
+        if filepath not in self._fingerprints:
+            size, mtime = Common.get_source_stat(filepath)
+            if self.source_hash:
+                self._fingerprints[filepath] = [size, Common.get_source_checksum(filepath)]
+            else:
+                self._fingerprints[filepath] = [os.path.basename(filepath), size, mtime]
+        return self._fingerprints[filepath]
+
+    def compose_file_header(self) -> str:
+        if not self.include_meta:
+            return ''
+        return Core.compose_copyright() + self.converter.compose_dump_header()
+
+    def compose_file_footer(self) -> str:
+        if not self.include_meta:
+            return ''
+        return "\n" + self.converter.compose_dump_footer()
+
+    def compose_unit_header(self, unit: DumpUnit) -> str:
+        if not self.include_meta:
+            return ''
+        if not unit.separator:
+            return "\n"
+        return "\n" + Core.compose_table_separator(unit.table_name, unit.region)
+
+    def _write_serial(self, dump_files: list[DumpFile], manifest: Manifest):
+        for dump_file in dump_files:
+            sources = self.get_unit_sources(dump_file)
+            if manifest.is_complete(dump_file.path, dict(sources)):
+                Common.cli_output(f'Skipping unchanged {dump_file.path}')
+                self.files_skipped += 1
+                continue
+            # Первая из проверенных частей - заголовок файла
+            verified, offset = manifest.verify_segments(dump_file.path, sources)
+            manifest.start_file(dump_file.path, offset)
+            f = self.open_writer(dump_file.path, offset, self.resume)
+            if verified == 0:
+                f.write(self.compose_file_header())
+                end, crc = f.checkpoint()
+                manifest.segment_done(dump_file.path, 'header', None, end, crc)
+                offset = end
+            else:
+                Common.cli_output(f'Resuming {dump_file.path} after {verified - 1} complete units')
+            for unit, (key, source) in list(zip(dump_file.units, sources))[max(verified - 1, 0):]:
+                Common.cli_output(f'Processing {unit}')
+                f.write(self.compose_unit_header(unit))
+                unit_metrics = self.converter.convert_table(f, unit.table_name, unit.region)
+                if unit_metrics is None:
+                    end, crc = f.checkpoint()
+                else:
+                    end, crc = unit_metrics.call('write', f.checkpoint)
+                    unit_metrics.output_bytes = end - offset
+                    self._add_metrics(unit_metrics, dump_file.path)
+                manifest.segment_done(dump_file.path, key, source, end, crc)
+                offset = end
+            f.write(self.compose_file_footer())
+            f.close()
+            self._collect_stats(f)
+            manifest.file_done(dump_file.path, dict(sources))
+
+    def _write_parallel(self, dump_files: list[DumpFile], manifest: Manifest):
+        """ Единицы работы конвертируются в отдельных процессах;
+        файл из одной единицы пишется процессом напрямую, остальные склеиваются из частей по порядку.
+        Готовые части сохраняются до склейки файла и при продолжении не конвертируются повторно. """
+        pending = []
+        for dump_file in dump_files:
+            sources = self.get_unit_sources(dump_file)
+            if manifest.is_complete(dump_file.path, dict(sources)):
+                Common.cli_output(f'Skipping unchanged {dump_file.path}')
+                self.files_skipped += 1
+                continue
+            ready = set()
+            if len(dump_file.units) > 1:
+                ready = {i for i, (key, source) in enumerate(sources)
+                         if manifest.is_part_ready(dump_file.path, i, _part_path(dump_file.path, i), key, source)}
+            pending.append((dump_file, sources, ready))
+
+        # Схемы разбираются заранее: при fork процессы-обработчики наследуют кэш определений
+        for table_name in sorted({unit.table_name for dump_file, _, _ in pending for unit in dump_file.units}):
+            self.converter.get_definition(table_name)
+
+        context = multiprocessing.get_context()
+        queue = context.Queue()
+        progress = ProgressCounter(queue, sum(len(dump_file.units) - len(ready) for dump_file, _, ready in pending))
+        progress.start()
+
+        scheduled = []
+        recorded = set()
+        with ProcessPoolExecutor(self.jobs, mp_context=context, initializer=_init_worker,
+                                 initargs=(queue,)) as executor:
+            try:
+                for dump_file, sources, ready in pending:
+                    if len(dump_file.units) == 1:
+                        unit = dump_file.units[0]
+                        header = self.compose_file_header() + self.compose_unit_header(unit)
+                        future = executor.submit(_convert_unit, self.converter, self.open_writer, dump_file.path,
+                                                 unit.table_name, unit.region, header, self.compose_file_footer())
+                        scheduled.append((dump_file, sources, [(0, future)], False))
+                        continue
+                    futures = []
+                    for i, unit in enumerate(dump_file.units):
+                        if i in ready:
+                            continue
+                        futures.append((i, executor.submit(_convert_unit, self.converter, self.open_writer,
+                                                           _part_path(dump_file.path, i), unit.table_name,
+                                                           unit.region, checksum=self.resume)))
+                    scheduled.append((dump_file, sources, futures, True))
+
+                for dump_file, sources, futures, merge in scheduled:
+                    for i, future in futures:
+                        stats = future.result()
+                        if stats[2] is not None:
+                            self._add_metrics(stats[2], dump_file.path)
+                        if merge:
+                            manifest.part_done(dump_file.path, i, *sources[i], stats[0], stats[3])
+                            recorded.add(_part_path(dump_file.path, i))
+                        else:
+                            self.bytes_written += stats[0]
+                            self.flush_count += stats[1]
+                        progress.unit_done()
+                    if merge:
+                        self._merge_parts(dump_file)
+                    manifest.file_done(dump_file.path, dict(sources))
+                    if merge:
+                        _remove_parts(dump_file)
+            except BaseException:
+                executor.shutdown(wait=True, cancel_futures=True)
+                self._keep_parts(scheduled, recorded, manifest)
+                raise
+            finally:
+                progress.stop()
+
+    @staticmethod
+    def _keep_parts(scheduled, recorded: set, manifest: Manifest):
+        """ После сбоя: части, дописанные процессами, сохраняются в журнале, недописанные удаляются """
+        for dump_file, sources, futures, merge in scheduled:
+            if not merge:
+                continue
+            for i, future in futures:
+                part_path = _part_path(dump_file.path, i)
+                if not os.path.exists(part_path):
+                    continue
+                if part_path in recorded:
+                    continue
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    stats = future.result()
+                    manifest.part_done(dump_file.path, i, *sources[i], stats[0], stats[3])
+                else:
+                    os.remove(part_path)
+
+    def _merge_parts(self, dump_file: DumpFile):
+        f = self.open_writer(dump_file.path)
+        f.write(self.compose_file_header())
+        for i, unit in enumerate(dump_file.units):
+            f.write(self.compose_unit_header(unit))
+            f.write_file(_part_path(dump_file.path, i))
+        f.write(self.compose_file_footer())
+        f.close()
+        self._collect_stats(f)
+
+    def _add_metrics(self, unit_metrics: UnitMetrics, path: str):
+        """ Метрики единицы работы в отчет; RSS замеряется процессом, конвертировавшим единицу """
+        unit_metrics.path = path
+        if unit_metrics.rss == 0:
+            unit_metrics.sample_rss()
+        self.metrics.add(unit_metrics)
+
+    def _collect_stats(self, writer: BlockWriter):
+        self.bytes_written += writer.bytes_written
+        self.flush_count += writer.flush_count
+
+
+_progress_queue = None
+
+
+def _init_worker(queue):
+    global _progress_queue  # pylint: disable=global-statement
+    _progress_queue = queue
+
+
+def _convert_unit(converter: BaseDumpConverter, open_writer, path: str, table_name: str, region: str | None,
+                  header: str = '', footer: str = '', checksum: bool = False):
+    converter.progress_handler = _progress_queue.put
+    f = open_writer(path, checksum=checksum)
+    f.write(header)
+    unit_metrics = converter.convert_table(f, table_name, region)
+    f.write(footer)
+    if unit_metrics is None:
+        _, crc = f.checkpoint()
+    else:
+        _, crc = unit_metrics.call('write', f.checkpoint)
+        unit_metrics.output_bytes = f.bytes_written
+        unit_metrics.sample_rss()
+    f.close()
+    return f.bytes_written, f.flush_count, unit_metrics, crc
+
+
+def _part_path(path: str, index: int) -> str:
+    return f'{path}.part{index:04d}'
+
+
+def _remove_parts(dump_file: DumpFile):
+    for i in range(len(dump_file.units)):
+        if os.path.exists(_part_path(dump_file.path, i)):
+            os.remove(_part_path(dump_file.path, i))
 
 
 class DirectOutput(BaseOutput):
     """ Дамп в целевой файл """
-    def write(self, tables: list[str], regions: list[str]):
+    def get_manifest_path(self):
+        # Журнал рядом с целевым файлом
+        return f'{self.output_path}{Manifest.FILENAME}'
+
+    def plan(self, tables, regions):
         # self.output_path is file here
-        f = open(self.output_path, "w", encoding='utf-8')
-        if self.include_meta:
-            f.write(Core.compose_copyright())
-            f.write(self.converter.compose_dump_header())
-        for table_name in Core.COMMON_TABLE_LIST:
-            if table_name in tables:
-                Common.cli_output(f'Processing table `{table_name}`')
-                if self.include_meta:
-                    f.write("\n")
-                    f.write(Core.compose_table_separator(table_name))
-                self.converter.convert_table(f, table_name, None)
+        path = self.output_path
+        if self.codec is not None and not path.endswith(f'.{self.codec.get_extension()}'):
+            path = f'{path}.{self.codec.get_extension()}'
+        units = [DumpUnit(table_name) for table_name in Core.COMMON_TABLE_LIST if table_name in tables]
         for region in regions:
-            Common.cli_output(f'Processing region directory `{region}`')
-            for table_name in Core.REGION_TABLE_LIST:
+            for table_name in Core.get_region_tables():
                 if table_name in tables:
-                    Common.cli_output(f'Processing table `{table_name}`')
-                    if self.include_meta:
-                        f.write("\n")
-                        f.write(Core.compose_table_separator(table_name, region))
-                    self.converter.convert_table(f, table_name, region)
-        if self.include_meta:
-            f.write("\n")
-            f.write(self.converter.compose_dump_footer())
-        f.close()
+                    units.append(DumpUnit(table_name, region))
+        return [DumpFile(path, units)]
 
 
 class RegionOutput(BaseOutput):
     """ Отдельный файл для каждой из общих таблиц;
     дамп региональных данных в целевой файл для каждого региона. """
-    def write(self, tables, regions):
+    def plan(self, tables, regions):
+        dump_files = []
         for table_name in Core.COMMON_TABLE_LIST:
             if table_name in tables:
-                Common.cli_output(f'Processing table `{table_name}`')
-                f = open(os.path.join(self.output_path, f'{table_name}.{self.converter.get_extension()}',), "w",
-                         encoding='utf-8')
-                if self.include_meta:
-                    f.write(Core.compose_copyright())
-                    f.write(self.converter.compose_dump_header())
-                    f.write("\n")
-                    f.write(Core.compose_table_separator(table_name))
-                self.converter.convert_table(f, table_name, None)
-                if self.include_meta:
-                    f.write("\n")
-                    f.write(self.converter.compose_dump_footer())
-                f.close()
+                path = os.path.join(self.output_path, f'{table_name}.{self.get_extension()}')
+                dump_files.append(DumpFile(path, [DumpUnit(table_name)]))
         for region in regions:
-            Common.cli_output(f'Processing region directory `{region}`')
-            f = open(os.path.join(self.output_path, f'{region}.{self.converter.get_extension()}',), "w",
-                     encoding='utf-8')
-            if self.include_meta:
-                f.write(Core.compose_copyright())
-                f.write(self.converter.compose_dump_header())
-            for table_name in Core.REGION_TABLE_LIST:
-                if table_name in tables:
-                    Common.cli_output(f'Processing table `{table_name}`')
-                    if self.include_meta:
-                        f.write("\n")
-                        f.write(Core.compose_table_separator(table_name, region))
-                    self.converter.convert_table(f, table_name, region)
-            if self.include_meta:
-                f.write("\n")
-                f.write(self.converter.compose_dump_footer())
-            f.close()
+            path = os.path.join(self.output_path, f'{region}.{self.get_extension()}')
+            units = [DumpUnit(table_name, region) for table_name in Core.get_region_tables() if table_name in tables]
+            dump_files.append(DumpFile(path, units))
+        return dump_files
 
 
 class TableOutput(BaseOutput):
     """ Отдельный файл для каждой из общих таблиц;
     дамп региональных данных дописывается в целевой файл для каждой таблицы. """
-    def write(self, tables, regions):
+    def plan(self, tables, regions):
+        dump_files = []
         for table_name in Core.COMMON_TABLE_LIST:
             if table_name in tables:
-                Common.cli_output(f'Processing table `{table_name}`')
-                f = open(os.path.join(self.output_path, f'{table_name}.{self.converter.get_extension()}'), "w",
-                         encoding='utf-8')
-                if self.include_meta:
-                    f.write(Core.compose_copyright())
-                    f.write(self.converter.compose_dump_header())
-                    f.write("\n")
-                self.converter.convert_table(f, table_name, None)
-                if self.include_meta:
-                    f.write("\n")
-                    f.write(self.converter.compose_dump_footer())
-                f.close()
-        for table_name in Core.REGION_TABLE_LIST:
+                path = os.path.join(self.output_path, f'{table_name}.{self.get_extension()}')
+                dump_files.append(DumpFile(path, [DumpUnit(table_name, separator=False)]))
+        for table_name in Core.get_region_tables():
             if table_name in tables:
-                Common.cli_output(f'Processing table `{table_name}`')
-                f = open(os.path.join(self.output_path, f'{table_name}.{self.converter.get_extension()}', ), "w",
-                         encoding='utf-8')
-                if self.include_meta:
-                    f.write(Core.compose_copyright())
-                    f.write(self.converter.compose_dump_header())
-                for region in regions:
-                    Common.cli_output(f'Processing region directory `{region}`')
-                    if self.include_meta:
-                        f.write("\n")
-                        f.write(Core.compose_table_separator(table_name, region))
-                    self.converter.convert_table(f, table_name, region)
-                if self.include_meta:
-                    f.write("\n")
-                    f.write(self.converter.compose_dump_footer())
-                f.close()
+                path = os.path.join(self.output_path, f'{table_name}.{self.get_extension()}')
+                dump_files.append(DumpFile(path, [DumpUnit(table_name, region) for region in regions]))
+        return dump_files
 
 
 class RegionTreeOutput(BaseOutput):
     """ Дамп повторяет исходную структуру файлов; дамп региональных файлов  """
-    def write(self, tables, regions):
+    def plan(self, tables, regions):
+        dump_files = []
         for table_name in Core.COMMON_TABLE_LIST:
             if table_name in tables:
-                Common.cli_output(f'Processing table `{table_name}`')
-                f = open(os.path.join(self.output_path, f'{table_name}.{self.converter.get_extension()}'), "w",
-                         encoding='utf-8')
-                if self.include_meta:
-                    f.write(Core.compose_copyright())
-                    f.write(self.converter.compose_dump_header())
-                    f.write("\n")
-                self.converter.convert_table(f, table_name, None)
-                if self.include_meta:
-                    f.write("\n")
-                    f.write(self.converter.compose_dump_footer())
-                f.close()
+                path = os.path.join(self.output_path, f'{table_name}.{self.get_extension()}')
+                dump_files.append(DumpFile(path, [DumpUnit(table_name, separator=False)]))
         for region in regions:
-            Common.cli_output(f'Processing region directory `{region}`')
             if not os.path.exists(os.path.join(self.output_path, region)):
                 os.mkdir(os.path.join(self.output_path, region))
-            for table_name in Core.REGION_TABLE_LIST:
+            for table_name in Core.get_region_tables():
                 if table_name in tables:
-                    Common.cli_output(f'Processing table `{table_name}`')
-                    f = open(os.path.join(self.output_path, region, f'{table_name}.{self.converter.get_extension()}', ),
-                             "w", encoding='utf-8')
-                    if self.include_meta:
-                        f.write(Core.compose_copyright())
-                        f.write(self.converter.compose_dump_header())
-                        f.write("\n")
-                        f.write(Core.compose_table_separator(table_name, region))
-                    self.converter.convert_table(f, table_name, region)
-                    if self.include_meta:
-                        f.write("\n")
-                        f.write(self.converter.compose_dump_footer())
-                    f.close()
+                    path = os.path.join(self.output_path, region, f'{table_name}.{self.get_extension()}')
+                    dump_files.append(DumpFile(path, [DumpUnit(table_name, region)]))
+        return dump_files
@@ -0,0 +1,97 @@
+"""
+Потоковое чтение таблиц ГАР из Python без промежуточного дампа.
+
+    >>> from ru_address import iter_rows, iter_batches
+    >>> for row in iter_rows('/path/to/gar_xml.zip', 'HOUSES', '77', columns=['OBJECTID', 'HOUSENUM'],
+    ...                      where=['ISACTUAL=1'], named=True):
+    ...     print(row.OBJECTID, row.HOUSENUM)
+
+Значения типизированы по XSD: целые - int, xs:boolean - bool, xs:date - datetime.date, остальное - str,
+отсутствующий атрибут - None. Разбор потоковый, как у `dump`: в памяти одна запись (для iter_batches - одна пачка).
+"""
+import collections
+import functools
+import os
+from typing import Iterator
+from ru_address.common import Common
+from ru_address.core import Core
+from ru_address.errors import FilterError, SourceError
+from ru_address.filter import RowFilter
+from ru_address.source.xml import Data, Definition, DefinitionCache
+
+
+def iter_rows(source_path: str, table: str, region: str | None = None, columns: list[str] | None = None,
+              schema_path: str | None = None, where: list[str] | None = None, named: bool = False) -> Iterator[tuple]:
+    """ Записи таблицы `table` (региона `region` для региональных таблиц) кортежами значений по порядку полей XSD.
+    `source_path` и `schema_path` (по умолчанию - `source_path`) - директории или ZIP архивы выгрузки;
+    `columns` - только эти поля (в порядке XSD); `where` - условия как у `dump --where`, в том числе на поля
+    вне `columns`; с `named` строки - namedtuple с именами полей. """
+    data, definition, row_type = _open_table(source_path, table, region, columns, schema_path, where, named)
+    return data.iter_rows(definition, True, row_type)
+
+
+def iter_batches(source_path: str, table: str, region: str | None = None, columns: list[str] | None = None,
+                 schema_path: str | None = None, where: list[str] | None = None, named: bool = False,
+                 batch_size: int = 10000) -> Iterator[list[tuple]]:
+    """ Те же записи, что у iter_rows, списками не длиннее `batch_size` """
+    if batch_size < 1:
+        raise ValueError('batch_size must be positive')
+    data, definition, row_type = _open_table(source_path, table, region, columns, schema_path, where, named)
+    return data.iter_batches(definition, batch_size, True, row_type)
+
+
+def get_fields(schema_path: str, table: str, columns: list[str] | None = None) -> list[str]:
+    """ Поля строк iter_rows / iter_batches по порядку """
+    return _get_definition(schema_path, table, columns).get_table_fields()
+
+
+@functools.lru_cache(maxsize=None)
+def get_row_type(table: str, fields: tuple[str, ...]):
+    """ namedtuple строки таблицы; один тип на таблицу и набор полей """
+    return collections.namedtuple(table, fields)
+
+
+def _get_definition(schema_path: str, table: str, columns: list[str] | None = None) -> Definition:
+    if table not in Core.get_known_tables():
+        raise SourceError(f'Unknown table `{table}`')
+    definition = DefinitionCache.get(table, schema_path, Core.get_known_tables()[table])
+    if columns is None:
+        return definition
+    unknown = [field for field in columns if field not in definition.get_table_fields()]
+    if unknown:
+        raise SourceError(f"No such column in {table}: {', '.join(unknown)}")
+    return definition.select(columns)
+
+
+def _open_table(source_path, table, region, columns, schema_path, where, named) -> tuple[Data, Definition, type]:
+    if schema_path is None:
+        schema_path = source_path
+    definition = _get_definition(schema_path, table, columns)
+
+    path = source_path
+    if table in Core.REGION_TABLE_LIST:
+        if region is None:
+            raise SourceError(f'Table `{table}` is regional, `region` is required')
+        path = os.path.join(source_path, region)
+    elif region is not None:
+        raise SourceError(f'Table `{table}` is common for all regions, `region` must be None')
+
+    row_filter = None
+    if where:
+        # Условия проверяются по всем полям таблицы, не только выбранным
+        full_definition = _get_definition(schema_path, table)
+        row_filter = RowFilter(where)
+        unknown = {field for table_name, field, _, _ in row_filter.conditions if table_name in (None, table)} \
+            - set(full_definition.get_table_fields())
+        if unknown:
+            raise FilterError(f"No such field in {table}: {', '.join(sorted(unknown))}")
+        row_filter = row_filter.compile(table, full_definition.get_table_fields(), full_definition.get_field_types())
+
+    row_type = get_row_type(table, tuple(definition.get_table_fields())) if named else None
+    # Без вывода прогресса в консоль
+    data = Data(table, Common.get_source_filepath(path, table, 'xml'), None, _skip_progress, row_filter=row_filter)
+    return data, definition, row_type
+
+
+def _skip_progress(_):
+    pass
@@ -6,6 +6,8 @@
     <xsl:param name="table_name" />
     <xsl:param name="index" />
     <xsl:param name="include_drop" />
+    <!-- Selected columns as ",ID,NAME,", empty for all -->
+    <xsl:param name="columns" />
     <xsl:param name="table_engine" />
 
     <xsl:template match="/">
@@ -13,7 +15,7 @@
             <xsl:text>DROP TABLE IF EXISTS `</xsl:text><xsl:value-of select="$table_name"/><xsl:text>`;&#xa;</xsl:text>
         </xsl:if>
         <xsl:text>CREATE TABLE `</xsl:text><xsl:value-of select="$table_name"/><xsl:text>` (&#xa;</xsl:text>
-        <xsl:for-each select=".//xs:complexType[1]/xs:attribute" >
+        <xsl:for-each select=".//xs:complexType[1]/xs:attribute[$columns = '' or contains($columns, concat(',', normalize-space(@name), ','))]" >
             <!-- Column -->
             <xsl:text>  `</xsl:text><xsl:value-of select="normalize-space(@name)"/><xsl:text>` </xsl:text>
 
@@ -6,13 +6,15 @@
     <xsl:param name="table_name" />
     <xsl:param name="index" />
     <xsl:param name="include_drop" />
+    <!-- Selected columns as ",ID,NAME,", empty for all -->
+    <xsl:param name="columns" />
     
     <xsl:template match="/">
         <xsl:if test="$include_drop = '1'">
             <xsl:text>DROP TABLE IF EXISTS "</xsl:text><xsl:value-of select="$table_name"/><xsl:text>";&#xa;</xsl:text>
         </xsl:if>
         <xsl:text>CREATE TABLE "</xsl:text><xsl:value-of select="$table_name"/><xsl:text>" (&#xa;</xsl:text>
-        <xsl:for-each select=".//xs:complexType[1]/xs:attribute">
+        <xsl:for-each select=".//xs:complexType[1]/xs:attribute[$columns = '' or contains($columns, concat(',', normalize-space(@name), ','))]">
             <!-- Column -->
             <xsl:text>  "</xsl:text><xsl:value-of select="normalize-space(@name)"/><xsl:text>" </xsl:text>
 
@@ -95,7 +97,7 @@
         </xsl:if>
 
         <!-- Column comments -->
-        <xsl:for-each select=".//xs:complexType[1]/xs:attribute">
+        <xsl:for-each select=".//xs:complexType[1]/xs:attribute[$columns = '' or contains($columns, concat(',', normalize-space(@name), ','))]">
             <xsl:if test="xs:annotation/xs:documentation">
                 <xsl:text>COMMENT ON COLUMN "</xsl:text>
                 <xsl:value-of select="$table_name" />
@@ -0,0 +1,55 @@
+<?xml version="1.0" encoding="UTF-8"?>
+<xsl:stylesheet version="1.0" xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+    <xsl:output method="text" encoding="UTF-8"/>
+    
+    <!-- From XSLT processor -->
+    <xsl:param name="table_name" />
+    <xsl:param name="index" />
+    <xsl:param name="include_drop" />
+    <!-- Selected columns as ",ID,NAME,", empty for all -->
+    <xsl:param name="columns" />
+    
+    <xsl:template match="/">
+        <xsl:if test="$include_drop = '1'">
+            <xsl:text>DROP TABLE IF EXISTS "</xsl:text><xsl:value-of select="$table_name"/><xsl:text>";&#xa;</xsl:text>
+        </xsl:if>
+        <xsl:text>CREATE TABLE "</xsl:text><xsl:value-of select="$table_name"/><xsl:text>" (&#xa;</xsl:text>
+        <xsl:for-each select=".//xs:complexType[1]/xs:attribute[$columns = '' or contains($columns, concat(',', normalize-space(@name), ','))]">
+            <!-- Column -->
+            <xsl:text>  "</xsl:text><xsl:value-of select="normalize-space(@name)"/><xsl:text>" </xsl:text>
+
+            <!-- Column Type -->
+            <xsl:choose>
+                <xsl:when test="xs:simpleType/xs:restriction/@base='xs:integer' or xs:simpleType/xs:restriction/@base='xs:int' or xs:simpleType/xs:restriction/@base='xs:long' or xs:simpleType/xs:restriction/@base='xs:byte'">INTEGER</xsl:when>
+                <xsl:when test="@type='xs:integer' or @type='xs:long'">INTEGER</xsl:when>
+                <xsl:when test="@type='xs:boolean'">INTEGER</xsl:when>
+                <xsl:otherwise>TEXT</xsl:otherwise>
+            </xsl:choose>
+
+            <!-- Column required -->
+            <xsl:choose>
+                <xsl:when test="@use='required'">
+                    <xsl:text> NOT NULL</xsl:text>
+                </xsl:when>
+                <xsl:otherwise>
+                    <xsl:text> NULL DEFAULT NULL</xsl:text>
+                </xsl:otherwise>
+            </xsl:choose>
+
+            <!-- Columns separator -->
+            <xsl:choose>
+                <xsl:when test="position()!=last()">,&#xa;</xsl:when>
+                <xsl:otherwise>
+                    <xsl:if test="$index !=''">,&#xa;  <xsl:value-of select="$index"/></xsl:if>
+                </xsl:otherwise>
+            </xsl:choose>
+        </xsl:for-each>
+
+        <!-- End of column definitions -->
+        <xsl:text>&#xa;)</xsl:text>
+        <xsl:text>;&#xa;</xsl:text>
+
+        <!-- separate table definitions -->
+        <xsl:text>&#xa;</xsl:text>
+    </xsl:template>
+</xsl:stylesheet>
\ No newline at end of file
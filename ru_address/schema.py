@@ -4,7 +4,7 @@ from collections import OrderedDict
 import lxml.etree as et
 
 from ru_address import package_directory
-from ru_address.source.xml import Definition
+from ru_address.source.xml import Definition, DefinitionCache
 from ru_address.errors import UnknownPlatformError
 from ru_address.index import Index
 from ru_address.core import Core
@@ -33,6 +33,7 @@ class ConverterRegistry:
             'mysql': MyConverter,
             'psql':  PostgresConverter,
             'ch':    ClickhouseConverter,
+            'sqlite': SqliteConverter,
         }
 
     @staticmethod
@@ -48,11 +49,17 @@ class BaseSchemaConverter(ABC):
         self.schema_stylesheet_file = schema_stylesheet_file
         self.index_stylesheet_file = index_stylesheet_file
         self.options = options
+        # Выбранные колонки по таблицам (`--columns`), остальные таблицы целиком
+        self.columns = {}
+        self._transform = None
+        self._index = None
 
     def process(self, source_path: str, tables: list[str], include_keys: bool):
         output = OrderedDict()
-        definitions = self.generate_definitions(source_path, Core.KNOWN_ENTITIES)
-        known_tables = Core.get_known_tables()
+        known_tables = Core.get_all_tables()
+        # Разбираем только схемы запрошенных таблиц
+        entities = list(OrderedDict.fromkeys(known_tables[table_name] for table_name in tables))
+        definitions = self.generate_definitions(source_path, entities)
         for table_name in tables:
             target_entity = known_tables[table_name]
             definition = definitions.get(target_entity, None)
@@ -65,21 +72,32 @@ class BaseSchemaConverter(ABC):
         output = OrderedDict()
         for entity in entities:
             Common.cli_output(entity)
-            source_file = Common.get_source_filepath(source_path, entity, 'xsd')
-            definition = Definition(entity, source_file)
-            output[entity] = definition
+            output[entity] = DefinitionCache.get(entity, Core.get_schema_path(entity, source_path), entity)
         return output
 
+    def get_transform(self):
+        """ Шаблон схемы компилируется один раз на конвертер """
+        if self._transform is None:
+            self._transform = et.XSLT(et.parse(self.schema_stylesheet_file))
+        return self._transform
+
+    def get_index(self) -> Index:
+        if self._index is None:
+            self._index = Index(self.index_stylesheet_file)
+        return self._index
+
     def convert_table(self, definition: Definition, table_name: str, include_keys: bool):
-        stylesheet = et.parse(self.schema_stylesheet_file)
-        transform = et.XSLT(stylesheet)
+        transform = self.get_transform()
 
         # Template variables
         options = self.options.copy()
         options['table_name'] = table_name
+        options['columns'] = ''
+        if table_name in self.columns:
+            options['columns'] = f",{','.join(self.columns[table_name])},"
         options['index'] = None
         if include_keys:
-            options['index'] = Index(self.index_stylesheet_file).build(table_name)
+            options['index'] = self.get_index().build(table_name)
 
         for k, v in options.items():
             options[k] = transform.strparam(v)
@@ -130,6 +148,23 @@ class PostgresConverter(BaseSchemaConverter):
     def get_extension() -> str:
         return 'sql'
 
+    @staticmethod
+    def get_column_type(field_type: dict) -> str:
+        """ Тип колонки, как его выводит postgres.schema.xsl; по нему строятся бинарные дампы (pgbinary) """
+        base = field_type['type']
+        if field_type['restricted']:
+            if base in ('integer', 'int', 'long'):
+                return {5: 'smallint', 10: 'integer', 19: 'bigint'}.get(field_type['digits'], 'integer')
+            if base == 'byte':
+                return 'smallint'
+            if base == 'string':
+                length = field_type['length'] or 128
+                return 'text' if length > 255 else f'varchar({length})'
+            if base == 'date':
+                return 'date'
+            return 'varchar(128)'
+        return {'date': 'date', 'boolean': 'boolean', 'integer': 'integer', 'long': 'bigint'}.get(base, 'varchar(128)')
+
 
 class ClickhouseConverter(BaseSchemaConverter):
     """
@@ -149,3 +184,36 @@ class ClickhouseConverter(BaseSchemaConverter):
     @staticmethod
     def get_extension() -> str:
         return 'sql'
+
+    @staticmethod
+    def get_column_type(field_type: dict) -> str:
+        """ Тип колонки, как его выводит clickhouse.schema.xsl (`NULL` - Nullable); по нему строится дамп RowBinary """
+        base = field_type['type']
+        if field_type['restricted'] and base in ('integer', 'int', 'long'):
+            column_type = {5: 'Int16', 10: 'Int32', 19: 'Int64'}.get(field_type['digits'], 'Int32')
+        elif field_type['restricted']:
+            column_type = {'byte': 'Int8', 'string': 'String', 'date': 'Date'}.get(base, 'String')
+        else:
+            column_type = {'date': 'Date', 'boolean': 'Bool', 'integer': 'Int32', 'long': 'Int64'}.get(base, 'String')
+        if field_type['required']:
+            return column_type
+        return f'Nullable({column_type})'
+
+
+class SqliteConverter(BaseSchemaConverter):
+    """
+    SQLite compatible converter
+    """
+    def __init__(self):
+        BaseSchemaConverter.__init__(
+            self,
+            os.path.join(package_directory, 'resources', 'templates', 'sqlite.schema.xsl'),
+            os.path.join(package_directory, 'resources', 'templates', 'sqlite.index.xsl'),
+            {
+                "include_drop": os.environ.get("RA_INCLUDE_DROP", "1"),
+            }
+        )
+
+    @staticmethod
+    def get_extension() -> str:
+        return 'sql'
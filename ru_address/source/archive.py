@@ -0,0 +1,73 @@
+import fnmatch
+import os
+import posixpath
+import time
+import zipfile
+
+
+class Archive:
+    """ Чтение файлов выгрузки напрямую из ZIP архива ФНС без распаковки на диск.
+    Файл внутри архива адресуется путем вида `/путь/gar_xml.zip/77/AS_HOUSES_2...XML` """
+
+    # Открытые архивы текущего процесса; после fork дескриптор не переиспользуется,
+    # каждый процесс-обработчик открывает архив заново
+    _opened = {}
+
+    @staticmethod
+    def split(path: str) -> tuple[str, str] | None:
+        """ Разделяет путь на файл архива и путь внутри него, None - если путь не ведет в архив """
+        head = os.path.normpath(path)
+        inner = []
+        while head:
+            if head.lower().endswith('.zip') and os.path.isfile(head):
+                return head, '/'.join(reversed(inner))
+            head, tail = os.path.split(head)
+            if not tail:
+                break
+            inner.append(tail)
+        return None
+
+    @staticmethod
+    def get(archive_path: str) -> zipfile.ZipFile:
+        key = (os.getpid(), archive_path)
+        if key not in Archive._opened:
+            Archive._opened[key] = zipfile.ZipFile(archive_path)
+        return Archive._opened[key]
+
+    @staticmethod
+    def find(archive_path: str, directory: str, pattern: str) -> list[str]:
+        """ Файлы в директории архива, подходящие под glob-шаблон (с учетом регистра, как glob) """
+        found = []
+        for name in Archive.get(archive_path).namelist():
+            if name.endswith('/') or posixpath.dirname(name) != directory:
+                continue
+            if fnmatch.fnmatchcase(posixpath.basename(name), pattern):
+                found.append(os.path.join(archive_path, *name.split('/')))
+        return found
+
+    @staticmethod
+    def list_directories(archive_path: str, directory: str) -> list[str]:
+        prefix = f'{directory}/' if directory else ''
+        found = []
+        for name in Archive.get(archive_path).namelist():
+            if not name.startswith(prefix):
+                continue
+            parts = name[len(prefix):].split('/')
+            if len(parts) > 1 and parts[0] not in found:
+                found.append(parts[0])
+        return found
+
+    @staticmethod
+    def open(archive_path: str, member: str):
+        return Archive.get(archive_path).open(member)
+
+    @staticmethod
+    def stat(archive_path: str, member: str) -> tuple[int, float]:
+        """ Размер (распакованный) и время изменения файла внутри архива """
+        info = Archive.get(archive_path).getinfo(member)
+        return info.file_size, time.mktime(info.date_time + (0, 0, -1))
+
+    @staticmethod
+    def checksum(archive_path: str, member: str) -> int:
+        """ CRC32 содержимого из каталога архива, без распаковки """
+        return Archive.get(archive_path).getinfo(member).CRC
@@ -0,0 +1,360 @@
+import io
+import itertools
+import mmap
+import os
+import re
+from abc import ABC, abstractmethod
+from xml.parsers import expat
+import lxml.etree as et
+from ru_address.errors import UnknownPlatformError
+
+
+class ParserRegistry:
+    """
+    Registered XML parser backends.
+    """
+    @staticmethod
+    def get_parser(alias: str):
+        available = ParserRegistry.get_available_parsers()
+        return available.get(alias, None)
+
+    @staticmethod
+    def init_parser(alias: str):
+        _parser = ParserRegistry.get_parser(alias)
+        if _parser is None:
+            raise UnknownPlatformError(f"Unknown XML parser `{alias}`")
+        return _parser()
+
+    @staticmethod
+    def get_available_parsers() -> dict:
+        return {
+            'lxml':  LxmlParser,
+            'expat': ExpatParser,
+            'raw':   RawParser,
+        }
+
+    @staticmethod
+    def get_available_parsers_list() -> list:
+        return list(ParserRegistry.get_available_parsers().keys())
+
+
+class BaseParser(ABC):
+    """ Разбор файла выгрузки: плоский список элементов-записей, все данные в атрибутах """
+    @abstractmethod
+    def iter_records(self, source, entity_tag: str):
+        """ Атрибуты записей по порядку - функцией `get(name) -> str | None`, как у `elem.get` """
+
+
+class LxmlParser(BaseParser):
+    """ lxml iterparse: дерево строится и сразу вычищается за каждой записью """
+    def iter_records(self, source, entity_tag):
+        for elem in self.iter_elements(source, entity_tag):
+            yield elem.get
+
+    def iter_elements(self, source, entity_tag):
+        for _, elem in et.iterparse(source, events=('end',), tag=entity_tag):
+            yield elem
+
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+
+class ExpatParser(BaseParser):
+    """ pyexpat без дерева: атрибуты записи приходят в обработчик начала элемента готовым словарем.
+    Файл подается кусками по ``READ_SIZE``, записи куска отдаются после его разбора. """
+    READ_SIZE = 1024 * 1024
+
+    def iter_records(self, source, entity_tag):
+        records = []
+        append = records.append
+
+        def start_element(name, attributes):
+            if name == entity_tag:
+                append(attributes.get)
+
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = start_element
+        while True:
+            chunk = source.read(self.READ_SIZE)
+            parser.Parse(chunk, not chunk)
+            yield from records
+            records.clear()
+            if not chunk:
+                break
+
+
+class RawStructureError(Exception):
+    """ Файл не в плоском виде, который понимает RawParser """
+
+
+class RawParser(BaseParser):
+    """ Побайтовый разбор файла, отображенного в память (mmap), без XML парсера.
+    Понимает только плоскую выгрузку ГАР: пролог, корневой элемент и записи `<TAG A="..." B="..."/>`.
+    Файл обрабатывается кусками по ``CHUNK_SIZE``: нормализация пробельных символов, декодирование
+    сущностей (только если они есть в куске) и разметка записей делаются над всем куском, на запись
+    с атрибутами `A="..."` через пробел остается один `split` по `" `; прочие записи (одинарные кавычки,
+    пробелы вокруг `=`) разбираются регулярным выражением.
+    Через `iter_raw_records` записи отдаются с ключами и значениями в bytes (UTF-8) для кодировщика,
+    работающего с bytes (см. RowEncoder). Файл в ZIP архиве, другая кодировка, комментарии, DTD,
+    вложенные элементы и т.п. разбираются LxmlParser: заранее, если это видно по прологу, иначе с места,
+    где разбор споткнулся (уже отданные записи пропускаются). """
+    CHUNK_SIZE = 256 * 1024
+    PROLOG = re.compile(rb'(?:\xef\xbb\xbf)?(<\?xml[^>]*\?>)?\s*<([^\s/>]+)(?:\s[^>]*)?(?<!/)>\s*')
+    ENCODING = re.compile(rb'''encoding\s*=\s*["']([^"']*)["']''')
+    RECORD_END = re.compile(rb'/>\s*')
+    ATTRIBUTE = re.compile(rb'''\s+([^\s=]+)\s*=\s*(?:"([^"]*)"|'([^']*)')''')
+    ATTRIBUTES = re.compile(rb'''(?:\s+[\w:.-]+\s*=\s*(?:"[^"]*"|'[^']*'))*\s*''')
+    ENTITY = re.compile(rb'&(?:(amp|lt|gt|quot|apos)|#([0-9]+)|#x([0-9A-Fa-f]+));')
+    # Кавычки из сущностей временно заменяются байтами \x01 и \x02, чтобы не ломать разбиение записи
+    ENTITIES = {b'amp': b'&', b'lt': b'<', b'gt': b'>', b'quot': b'\x01', b'apos': b'\x02'}
+    NAMES = re.compile(rb'[\w:.-]+(?: [\w:.-]+)*')
+
+    def iter_records(self, source, entity_tag):
+        return self._iter_records(source, entity_tag, False)
+
+    def iter_raw_records(self, source, entity_tag):
+        """ Как `iter_records`, но `get(b'NAME') -> bytes | None` """
+        return self._iter_records(source, entity_tag, True)
+
+    def _iter_records(self, source, entity_tag, raw):
+        try:
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            # Файл в архиве, пустой файл
+            mapped = None
+
+        count = 0
+        if mapped is not None:
+            # Часть файла (SourceRange) - только записи между ее границами
+            records = self._scan(mapped, entity_tag.encode('utf-8'), getattr(source, 'span', None))
+            try:
+                if raw:
+                    for count, parts in enumerate(records, 1):
+                        pairs = iter(parts)
+                        yield dict(zip(pairs, pairs)).get
+                else:
+                    for count, parts in enumerate(records, 1):
+                        pairs = iter(b'\x00'.join(parts).decode('utf-8').split('\x00'))
+                        yield dict(zip(pairs, pairs)).get
+                return
+            except RawStructureError:
+                source.seek(0)
+            finally:
+                records.close()
+                mapped.close()
+
+        elements = itertools.islice(LxmlParser().iter_elements(source, entity_tag), count, None)
+        if not raw:
+            for elem in elements:
+                yield elem.get
+            return
+        for elem in elements:
+            yield {k.encode('utf-8'): v.encode('utf-8') for k, v in elem.items()}.get
+
+    def _scan(self, mapped, tag: bytes, span: tuple[int, int] | None = None):
+        """ Записи списками `[имя, значение, имя, значение...]`; со `span` - только записи между его границами """
+        prolog = RawParser.PROLOG.match(mapped)
+        if prolog is None or prolog.group(2)[:1] in (b'!', b'?'):
+            # Комментарий, DTD или инструкция обработки перед корнем
+            raise RawStructureError()
+        declaration, root = prolog.group(1) or b'', prolog.group(2)
+        encoding = RawParser.ENCODING.search(declaration)
+        if encoding is not None and encoding.group(1).lower().replace(b'_', b'-') not in (b'utf-8', b'utf8'):
+            raise RawStructureError()
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+        prefix = b'<' + tag + b' '
+        position, until = prolog.end(), len(mapped)
+        if span is not None:
+            position, until = span
+        last = max(mapped.rfind(b'/>', position, until) + 2, position)
+        while position < last:
+            end = mapped.find(b'/>', min(position + RawParser.CHUNK_SIZE, last - 2)) + 2
+            chunk = mapped[position:end]
+            yield from RawParser._split(chunk, prefix)
+            if hasattr(mmap, 'MADV_DONTNEED'):
+                # Прочитанные страницы не держим в памяти процесса
+                start = position - position % mmap.PAGESIZE
+                mapped.madvise(mmap.MADV_DONTNEED, start, end - start)
+            position = end
+
+        tail = re.compile(rb'\s*' if span is not None else rb'\s*</' + re.escape(root) + rb'\s*>\s*')
+        if tail.fullmatch(mapped, position, until) is None:
+            raise RawStructureError()
+
+    @staticmethod
+    def _split(chunk: bytes, prefix: bytes):
+        """ Записи куска, заканчивающегося на `/>` """
+        # \x00-\x02 в XML 1.0 недопустимы, они служат разделителями
+        if 0 in chunk or 1 in chunk or 2 in chunk:
+            raise RawStructureError()
+        if 9 in chunk or 10 in chunk or 13 in chunk:
+            # Нормализация по правилам XML, между атрибутами и записями пробельные символы тоже равнозначны
+            chunk = chunk.replace(b'\r\n', b' ').replace(b'\r', b' ').replace(b'\n', b' ').replace(b'\t', b' ')
+        # Каждая `<` и `>` куска - начало и конец записи
+        records = chunk.count(b'/>')
+        if chunk.count(b'<') != records or chunk.count(b'>') != records:
+            raise RawStructureError()
+        # Разделитель записей; regex начинается с литерала, пробел перед `/>` убирается заменой
+        marked = RawParser.RECORD_END.sub(b'\x00', chunk.replace(b'" />', b'"/>'))
+        if 38 in marked:
+            marked = RawParser._decode(marked)
+        placeholders = 1 in marked or 2 in marked
+
+        size = len(prefix)
+        if marked.startswith(prefix) and marked.endswith(b'"\x00') and \
+                marked.count(b'"\x00' + prefix) == records - 1:
+            # Все записи вида `<TAG ..."/>`: `<TAG A="1"\x00<TAG B="2"\x00` -> `A" 1\x00B" 2`
+            pieces = marked[size:-2].replace(b'"\x00' + prefix, b'\x00').replace(b'="', b'" ').split(b'\x00')
+        else:
+            pieces = marked.split(b'\x00')
+            if pieces.pop():
+                raise RawStructureError()
+            pieces = [RawParser._strip(piece, prefix) for piece in pieces]
+        if len(pieces) != records:
+            raise RawStructureError()
+
+        originals = None
+        for i, piece in enumerate(pieces):
+            # `A" 1" B" 2` -> [A, 1, B, 2]: значение в двойных кавычках не может содержать кавычку
+            parts = piece.split(b'" ') if piece is not None else [None]
+            names = parts[::2]
+            if len(parts) % 2 or not b''.join(names).isalnum() and \
+                    RawParser.NAMES.fullmatch(b' '.join(names)) is None:
+                # Одинарные кавычки, пробелы вокруг `=`, запись без атрибутов
+                if originals is None:
+                    originals = marked.split(b'\x00')
+                piece = originals[i]
+                parts = RawParser._parse(piece, prefix)
+            if placeholders and (1 in piece or 2 in piece):
+                parts[1::2] = b'\x00'.join(parts[1::2]).replace(b'\x01', b'"').replace(b'\x02', b"'").split(b'\x00')
+            yield parts
+
+    @staticmethod
+    def _strip(piece: bytes, prefix: bytes) -> bytes | None:
+        """ `<TAG A="1" B="2"` -> `A" 1" B" 2`; None - запись другого вида """
+        if piece.startswith(prefix) and piece.endswith(b'"'):
+            return piece[len(prefix):-1].replace(b'="', b'" ')
+        return None
+
+    @staticmethod
+    def _parse(piece: bytes, prefix: bytes) -> list:
+        """ Запись произвольного вида регулярным выражением """
+        body = piece[len(prefix) - 1:]
+        if not piece.startswith(prefix[:-1]) or RawParser.ATTRIBUTES.fullmatch(body) is None:
+            raise RawStructureError()
+        parts = []
+        for name, double, single in RawParser.ATTRIBUTE.findall(body):
+            parts += (name, double or single)
+        return parts
+
+    @staticmethod
+    def _decode(chunk: bytes) -> bytes:
+        """ Ссылки на символы и встроенные сущности """
+        if chunk.count(b'&') != len(RawParser.ENTITY.findall(chunk)):
+            # Сущность из DTD или голый `&`
+            raise RawStructureError()
+        return RawParser.ENTITY.sub(RawParser._entity, chunk)
+
+    @staticmethod
+    def _entity(match) -> bytes:
+        name, decimal, hexadecimal = match.groups()
+        if name is not None:
+            return RawParser.ENTITIES[name]
+        code = int(decimal) if decimal is not None else int(hexadecimal, 16)
+        # Допустимые символы XML 1.0; недопустимый разберет (и отвергнет) lxml
+        if not (code in (0x9, 0xa, 0xd) or 0x20 <= code <= 0xd7ff or 0xe000 <= code <= 0xfffd
+                or 0x10000 <= code <= 0x10ffff):
+            raise RawStructureError()
+        return {0x22: b'\x01', 0x27: b'\x02'}.get(code) or chr(code).encode('utf-8')
+
+
+class SourceRange:
+    """ Часть файла выгрузки для параллельного разбора: записи с `start` по `end` (байты).
+    Читается (`open`) как самостоятельный XML документ: пролог файла с открывающим тегом корня,
+    записи части и закрывающий тег корня, так что подходит любому парсеру. """
+    def __init__(self, path: str, prolog: bytes, root: bytes, start: int, end: int):
+        self.path = path
+        self.prolog = prolog
+        self.root = root
+        self.start = start
+        self.end = end
+
+    @staticmethod
+    def split(path: str, entity_tag: str, size: int) -> list['SourceRange']:
+        """ Делит файл на части примерно по `size` байт по началу записи `<TAG`, в значениях атрибутов `<`
+        экранирован. Пустой список - файл не делится: меньше двух частей, DTD или комментарий перед корнем """
+        with open(path, 'rb') as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Пустой файл
+                return []
+            with mapped:
+                prolog = RawParser.PROLOG.match(mapped)
+                if prolog is None or prolog.group(2)[:1] in (b'!', b'?'):
+                    # Комментарий, DTD или инструкция обработки перед корнем
+                    return []
+                record = re.compile(b'<' + re.escape(entity_tag.encode('utf-8')) + rb'[\s/>]')
+                end = mapped.rfind(b'</')
+                found = record.search(mapped, prolog.end(), end)
+                boundaries = []
+                while found is not None:
+                    boundaries.append(found.start())
+                    found = record.search(mapped, found.start() + max(size, 1), end)
+                if len(boundaries) < 2:
+                    return []
+                boundaries.append(end)
+                head, root = mapped[:prolog.end()], prolog.group(2)
+        return [SourceRange(path, head, root, start, stop)
+                for start, stop in itertools.pairwise(boundaries)]
+
+    def open(self) -> 'RangeReader':
+        return RangeReader(self)
+
+
+class RangeReader:
+    """ Файловый интерфейс части файла (см. SourceRange); `span` и `fileno` - для RawParser """
+    def __init__(self, source_range: SourceRange):
+        self.span = (source_range.start, source_range.end)
+        self._range = source_range
+        self._file = open(source_range.path, 'rb')
+        self._pending = []
+        self._left = 0
+        self.seek(0)
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if offset != 0 or whence != os.SEEK_SET:
+            raise io.UnsupportedOperation('Only rewind is supported')
+        self._file.seek(self._range.start)
+        self._left = self._range.end - self._range.start
+        self._pending = [self._range.prolog, b'</' + self._range.root + b'>']
+        return 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = sum(map(len, self._pending)) + self._left
+        data = b''
+        while len(data) < size:
+            if len(self._pending) == 2 or self._pending and not self._left:
+                # Пролог, затем записи части из файла, в конце закрывающий тег корня
+                head = self._pending.pop(0)
+                taken = size - len(data)
+                data += head[:taken]
+                if head[taken:]:
+                    self._pending.insert(0, head[taken:])
+            elif self._left:
+                block = self._file.read(min(size - len(data), self._left))
+                self._left = self._left - len(block) if block else 0
+                data += block
+            else:
+                break
+        return data
+
+    def close(self):
+        self._file.close()
@@ -1,92 +1,383 @@
+import codecs
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import lxml.etree as et
-from ru_address.common import TableRepresentation
+from ru_address.common import Common, TableRepresentation
+from ru_address.encoder import RowEncoder, ValueRowEncoder
 from ru_address.errors import DefinitionError
+from ru_address.source.archive import Archive
+from ru_address.source.parser import ParserRegistry, RawParser, SourceRange
+
+ROWS_PER_WRITE = 1000
 
 
 class Data:
     """ Конвертирует XML данные в настраиваемый текстовый формат """
-    def __init__(self, table_name, source_file, table_representation: TableRepresentation):
+    def __init__(self, table_name, source_file, table_representation: TableRepresentation, progress_handler=None,
+                 typed_values=False, row_filter=None):
         self.table_name = table_name
         self.data_source = source_file
         self.table_representation = table_representation
+        # Вызывается с количеством обработанных строк вместо вывода прогресса в консоль
+        self.progress_handler = progress_handler
+        # Кодировать значения по типу поля из XSD (см. RowEncoder)
+        self.typed_values = typed_values
+        # Предикат от `get` записи (см. RowFilter), отброшенные записи не кодируются
+        self.row_filter = row_filter
+        self.parser = ParserRegistry.init_parser(os.environ.get("RA_XML_PARSER", "lxml"))
+        # Разбор одного файла частями в `split_jobs` процессах: `range_handler(source_range, raw, binary)` кодирует
+        # часть в процессе-обработчике (см. encode_range), должен передаваться между процессами
+        self.split_jobs = 1
+        self.split_size = 64 * 1024 * 1024
+        self.range_handler = None
+        self.rows_read = 0
+        # UnitMetrics: записи, байты и время по стадиям (`--metrics`), None - не собираются
+        self.metrics = None
+        # Источник записей вместо XML файла (производные таблицы, см. AddressSource): `iter_records()` -> `get`
+        self.record_source = None
 
     def convert_and_dump(self, dump_file, definition, bulk_size):
-        if self.table_representation.table_start_handler:
-            dump_file.write(self.table_representation.table_start_handler(self.table_name))
-
+        representation = self.table_representation
         table_fields = definition.get_table_fields()
-        current_row = 0
-        context = et.iterparse(self.data_source, events=('end',), tag=definition.get_entity_tag())
-
-        for _, elem in context:
-            content = []
-
-            value_query_parts = []
-            for field in table_fields:
-                value = self.table_representation.null_repr
-                if elem.get(field) is not None:
-                    value = elem.get(field)
-                    if value == "false":
-                        value = self.table_representation.bool_repr[0]
-                    elif value == "true":
-                        value = self.table_representation.bool_repr[1]
-                    else:
-                        # SAX автоматически декодирует XML сущности, в значении могут быть кавычки и вообще что угодно
-                        if self.table_representation.escape is not None:
-                            value = value.translate(self.table_representation.escape)
-                        value = f'{self.table_representation.quotes}{value}{self.table_representation.quotes}'
-                value_query_parts.append(value)
-
-            value_query = self.table_representation.delimiter.join(value_query_parts)
-
-            # Формируем запрос
-            until_new_bulk = current_row % bulk_size
-
-            # Заканчиваем предыдущую строку
+        if representation.table_start_handler:
+            dump_file.write(representation.table_start_handler(self.table_name, table_fields))
+
+        # С RawParser строки собираются из bytes исходного файла без декодирования
+        raw = self._is_raw_target(dump_file)
+        ranges = self._split_source(definition)
+        # Части файла по возможности сразу кодируются в UTF-8 процессами-обработчиками
+        binary = raw or bool(ranges) and self._is_bytes_target(dump_file)
+        literal = (lambda text: text.encode('utf-8')) if binary else (lambda text: text)
+        write = dump_file.write_bytes if binary else dump_file.write
+
+        field_types = definition.get_field_types() if self.typed_values else None
+        encode = RowEncoder(table_fields, representation, field_types, raw).encode
+        line_ending = literal(representation.line_ending)
+        # Заканчиваем предыдущий INSERT и начинаем новый
+        batch_start = ''
+        if representation.batch_start_handler:
+            batch_start = representation.batch_start_handler(self.table_name, table_fields)
+        batch_end = representation.line_ending_last
+        if representation.batch_end_handler:
+            batch_end = representation.batch_end_handler(self.table_name, table_fields)
+        batch_start, batch_end = literal(batch_start), literal(batch_end)
+        batch_switch = batch_end + batch_start
+        empty = literal('')
+
+        start = time.perf_counter()
+        if self.metrics is not None:
+            encode = self.metrics.timed('encode', encode)
+            write = self.metrics.timed('write', write)
+
+        if ranges:
+            current_row = self._dump_ranges(write, ranges, raw, binary, bulk_size, line_ending, batch_start,
+                                            batch_switch, batch_end)
+        else:
+            # Строки копятся и отдаются на запись пачками, а не по одной
+            rows = []
+            append = rows.append
+
+            current_row = 0
+            until_new_bulk = bulk_size
+
+            for get in self._iter_records(definition, raw):
+                # SAX автоматически декодирует XML сущности, в значении могут быть кавычки и вообще что угодно;
+                # подходящий delimiter ставится перед следующей записью
+                if current_row == 0:
+                    append(batch_start + encode(get))
+                elif until_new_bulk == 0:
+                    append(batch_switch + encode(get))
+                    until_new_bulk = bulk_size
+                else:
+                    append(line_ending + encode(get))
+                until_new_bulk -= 1
+
+                current_row += 1
+                if current_row % ROWS_PER_WRITE == 0:
+                    write(empty.join(rows))
+                    rows.clear()
+
+            # Завершаем файл
             if current_row != 0:
-                line_ending = self.table_representation.line_ending
-                if until_new_bulk == 0:
-                    line_ending = self.table_representation.line_ending_last
-                content.append(line_ending)
-
-            # Начинаем новый инсерт, если нужно
-            if current_row == 0 or until_new_bulk == 0:
-                if self.table_representation.batch_start_handler:
-                    content.append(self.table_representation.batch_start_handler(self.table_name, table_fields))
-
-            # Данные для вставки, подходящий delimiter ставится у следующей записи
-            content.append(f'{self.table_representation.row_indent}'
-                           f'{self.table_representation.row_parentheses[0]}'
-                           f'{value_query}'
-                           f'{self.table_representation.row_parentheses[1]}')
+                append(batch_end)  # Заканчиваем последний INSERT запрос
+            write(empty.join(rows))
+        self.finish_metrics(start, current_row, not ranges)
+
+        if representation.table_end_handler:
+            dump_file.write(representation.table_end_handler(self.table_name))
+
+    def _dump_ranges(self, write, ranges, raw, binary, bulk_size, line_ending, batch_start, batch_switch, batch_end):
+        """ Части файла кодируются параллельно (см. encode_range) и склеиваются в исходном порядке;
+        пачки INSERT делятся по сквозному номеру строки, как при разборе файла целиком """
+        current_row = 0
+        for text, offsets, _ in self._iter_ranges(ranges, raw, binary):
+            count = len(offsets)
+            if count == 0:
+                continue
+            if current_row == 0:
+                write(batch_start)
+            elif current_row % bulk_size == 0:
+                write(batch_switch)
+            else:
+                write(line_ending)
+            # Строки части разделены line_ending, на границе пачки он заменяется окончанием и началом INSERT
+            start = 0
+            if batch_switch != line_ending:
+                for i in range(-current_row % bulk_size or bulk_size, count, bulk_size):
+                    write(text[start:offsets[i] - len(line_ending)])
+                    write(batch_switch)
+                    start = offsets[i]
+            write(text[start:] if start else text)
+            current_row += count
+
+        if current_row != 0:
+            write(batch_end)
+        return current_row
+
+    def _iter_ranges(self, ranges: list[SourceRange], raw, binary):
+        """ Результаты `range_handler` по частям в исходном порядке (с числом записанных строк части);
+        в работе не больше двух частей на процесс """
+        rows_read = 0
+        pending = deque()
+        ranges = iter(ranges)
+        context = multiprocessing.get_context()
+        with ProcessPoolExecutor(self.split_jobs, mp_context=context) as executor:
+            try:
+                for source_range in itertools.islice(ranges, 2 * self.split_jobs):
+                    pending.append(executor.submit(self.range_handler, source_range, raw, binary))
+                while pending:
+                    text, offsets, stats = pending.popleft().result()
+                    source_range = next(ranges, None)
+                    if source_range is not None:
+                        pending.append(executor.submit(self.range_handler, source_range, raw, binary))
+                    if self.metrics is not None:
+                        self.metrics.add(stats['stages'])
+                    yield text, offsets, stats['rows_written']
+
+                    rows_read += stats['rows_read']
+                    self._report_progress(rows_read, stats['rows_read'])
+            except BaseException:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+        self.rows_read = rows_read
+        self._report_progress(rows_read, 0, final=True)
+
+    def encode_range(self, definition, source_range: SourceRange, raw: bool, binary: bool):
+        """ Часть файла для `_dump_ranges`, в процессе-обработчике: строки через line_ending (str, с `binary` -
+        в UTF-8, с `raw` - из bytes RawParser), смещения начала строк и счетчики части (см. `_compose_range_stats`) """
+        representation = self.table_representation
+        encode = RowEncoder(definition.get_table_fields(), representation,
+                            definition.get_field_types() if self.typed_values else None, raw).encode
+        to_utf8 = _encode_utf8
+        line_ending = representation.line_ending.encode('utf-8') if binary else representation.line_ending
+
+        start = time.perf_counter()
+        if self.metrics is not None:
+            encode = self.metrics.timed('encode', encode)
+            to_utf8 = self.metrics.timed('encode', to_utf8)
+        rows = [encode(get) for get in self._iter_records(definition, raw, source_range)]
+        if binary and not raw:
+            rows = to_utf8(rows)
+        step = len(line_ending)
+        offsets = array('Q', itertools.accumulate((len(row) + step for row in rows[:-1]), initial=0) if rows else ())
+        return line_ending.join(rows), offsets, self._compose_range_stats(start, len(rows))
+
+    def _compose_range_stats(self, start, rows_written) -> dict:
+        """ Прочитано и записано строк частью файла, с `metrics` - время ее стадий `parse` и `encode` """
+        stats = {'rows_read': self.rows_read, 'rows_written': rows_written, 'stages': None}
+        if self.metrics is not None:
+            stages = self.metrics.stages
+            stages['parse'] += time.perf_counter() - start - stages['encode']
+            stats['stages'] = stages
+        return stats
+
+    def finish_metrics(self, start, rows_written, parsed=True):
+        """ Итоги единицы работы; `parsed` - файл разбирался в этом процессе,
+        тогда `parse` - время, не ушедшее на `encode` и `write` """
+        metrics = self.metrics
+        if metrics is None:
+            return
+        metrics.seconds = time.perf_counter() - start
+        if parsed:
+            metrics.stages['parse'] += metrics.seconds - metrics.stages['encode'] - metrics.stages['write']
+        metrics.rows_read = self.rows_read
+        metrics.rows_written = rows_written
+        if self.record_source is not None:
+            metrics.source_bytes = self.record_source.source_bytes
+        else:
+            metrics.source_bytes = Common.get_source_stat(self.data_source)[0]
+
+    def iter_rows(self, definition, dates=False, row_type=None):
+        """ Записи таблицы кортежами значений Python (см. ValueRowEncoder) """
+        encode = ValueRowEncoder(definition.get_table_fields(), definition.get_field_types(), dates, row_type).encode
+        for get in self._iter_records(definition):
+            yield encode(get)
+
+    def iter_batches(self, definition, batch_size, dates=False, row_type=None):
+        """ Записи таблицы списками не длиннее `batch_size`, в памяти одновременно только одна пачка """
+        batch = []
+        for row in self.iter_rows(definition, dates, row_type):
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _is_raw_target(self, dump_file) -> bool:
+        """ Можно ли писать строки в bytes из RawParser """
+        if not isinstance(self.parser, RawParser) or self.record_source is not None:
+            return False
+        if self.row_filter is not None and getattr(self.row_filter, 'raw', None) is None:
+            return False
+        return self._is_bytes_target(dump_file)
+
+    @staticmethod
+    def _is_bytes_target(dump_file) -> bool:
+        """ Можно ли писать строки в bytes: файл в UTF-8 без замены переводов строк """
+        if not hasattr(dump_file, 'write_bytes'):
+            return False
+        encoding = getattr(dump_file, 'encoding', 'utf-8')
+        return codecs.lookup(encoding).name == 'utf-8' and os.linesep == '\n'
+
+    def _iter_records(self, definition, raw=False, source_range: SourceRange | None = None):
+        """ Атрибуты записей по порядку (прошедших `row_filter`) - функцией `get`, см. BaseParser;
+        с `raw` - в bytes, см. RawParser; с `source_range` - только записи этой части файла
+        (прогресс по частям сообщает `_iter_ranges`) """
+        accept = self.row_filter.raw if raw and self.row_filter is not None else self.row_filter
+        iter_records = self.parser.iter_raw_records if raw else self.parser.iter_records
+        current_row = 0
+        if self.record_source is not None:
+            source = None
+            records = self.record_source.iter_records()
+        else:
+            source = Common.open_source(self.data_source) if source_range is None else source_range.open()
+            records = iter_records(source, definition.get_entity_tag())
+        try:
+            for get in records:
+                if accept is None or accept(get):
+                    yield get
+
+                current_row += 1
+                if current_row % 10000 == 0 and source_range is None:
+                    self._report_progress(current_row, 10000)
+        finally:
+            if source is not None:
+                source.close()
+        self.rows_read = current_row
+        if source_range is None:
+            self._report_progress(current_row, current_row % 10000, final=True)
+
+    def _split_source(self, definition) -> list[SourceRange]:
+        """ Части файла для параллельного разбора, пустой список - файл разбирается целиком """
+        if self.record_source is not None or self.split_jobs < 2 or self.range_handler is None:
+            return []
+        if Archive.split(self.data_source) is not None:
+            return []
+        if os.path.getsize(self.data_source) < 2 * self.split_size:
+            return []
+        return SourceRange.split(self.data_source, definition.get_entity_tag(), self.split_size)
+
+    def _report_progress(self, current_row, delta, final=False):
+        if self.progress_handler is not None:
+            self.progress_handler(delta)
+        elif final:
+            print("")  # Перенос после прогресс-бара
+        else:
+            print(f"\r{current_row}+ row", end="", flush=True)
+
+
+class BinaryData(Data):
+    """ Конвертирует XML данные в бинарный формат, строка кодируется `row_encoder` в bytes """
+    def __init__(self, table_name, source_file, row_encoder, header=b'', trailer=b'', progress_handler=None,
+                 row_filter=None):
+        Data.__init__(self, table_name, source_file, None, progress_handler, row_filter=row_filter)
+        self.row_encoder = row_encoder
+        self.header = header
+        self.trailer = trailer
+
+    def convert_and_dump(self, dump_file, definition, bulk_size=None):
+        encode = self.row_encoder
+        write = dump_file.write_bytes
+        start = time.perf_counter()
+        if self.metrics is not None:
+            encode = self.metrics.timed('encode', encode)
+            write = self.metrics.timed('write', write)
+
+        ranges = self._split_source(definition)
+        if ranges:
+            current_row = 0
+            write(self.header)
+            for data, _, count in self._iter_ranges(ranges, False, True):
+                write(data)
+                current_row += count
+            write(self.trailer)
+            self.finish_metrics(start, current_row, False)
+            return
+
+        rows = [self.header]
+        append = rows.append
+
+        current_row = 0
+        for get in self._iter_records(definition):
+            append(encode(get))
 
             current_row += 1
-            if current_row % 10000 == 0:
-                print(f"\r{current_row}+ row", end="", flush=True)
+            if current_row % ROWS_PER_WRITE == 0:
+                write(b''.join(rows))
+                rows.clear()
 
-            dump_file.write(''.join(content))
+        append(self.trailer)
+        write(b''.join(rows))
+        self.finish_metrics(start, current_row)
 
-            elem.clear()
-            while elem.getprevious() is not None:
-                del elem.getparent()[0]
+    def encode_range(self, definition, source_range: SourceRange, raw: bool = False, binary: bool = True):
+        """ Строки части файла одним блоком, без разделителей; см. Data.encode_range """
+        encode = self.row_encoder if self.metrics is None else self.metrics.timed('encode', self.row_encoder)
+        start = time.perf_counter()
+        rows = [encode(get) for get in self._iter_records(definition, source_range=source_range)]
+        return b''.join(rows), None, self._compose_range_stats(start, len(rows))
 
-        # Завершаем файл
-        print("")  # Перенос после прогресс-бара
-        if current_row != 0:
-            dump_file.write(self.table_representation.line_ending_last)  # Заканчиваем последний INSERT запрос
 
-        if self.table_representation.table_end_handler:
-            dump_file.write(self.table_representation.table_end_handler(self.table_name))
+def _encode_utf8(rows: list[str]) -> list[bytes]:
+    return [row.encode('utf-8') for row in rows]
 
 
 class Definition:
     """ Представление XML схемы для разбора данных """
-    def __init__(self, title_name, source_file):
+    def __init__(self, title_name, source_file, meta: dict | None = None):
         self.title_name = title_name
-        self.tree = et.parse(source_file)
-        self.collection_tag = self._fetch_collection_tag()
-        self.entity_tag = self._fetch_entity_tag()
-        self.table_fields = self._fetch_table_fields()
+        self.source_file = source_file
+        self._tree = None
+        if meta is None:
+            meta = self._fetch_meta()
+        self.collection_tag = meta['collection_tag']
+        self.entity_tag = meta['entity_tag']
+        self.table_fields = meta['table_fields']
+        self.field_types = meta['field_types']
+
+    @property
+    def tree(self):
+        # Дерево XSD нужно только для XSLT преобразований, при работе из кэша схема не разбирается
+        if self._tree is None:
+            with Common.open_source(self.source_file) as source:
+                self._tree = et.parse(source)
+        return self._tree
+
+    def _fetch_meta(self) -> dict:
+        return {
+            'collection_tag': self._fetch_collection_tag(),
+            'entity_tag': self._fetch_entity_tag(),
+            'table_fields': self._fetch_table_fields(),
+            'field_types': self._fetch_field_types(),
+        }
 
     def _fetch_table_fields(self):
         table_fields = []
@@ -98,6 +389,36 @@ class Definition:
 
         return table_fields
 
+    def _fetch_field_types(self):
+        """ Описание типа каждого поля: базовый тип XSD, totalDigits, длина строки, обязательность """
+        field_types = []
+
+        namespace = {'xs': 'http://www.w3.org/2001/XMLSchema'}
+        for element in self.tree.findall(".//xs:attribute", namespace):
+            base = element.attrib.get('type')
+            restriction = element.find("./xs:simpleType/xs:restriction", namespace)
+            if restriction is not None:
+                base = restriction.attrib.get('base')
+            field_types.append({
+                'type': (base or 'xs:string').split(':')[-1],
+                'digits': self._fetch_facet(restriction, 'totalDigits'),
+                'length': self._fetch_facet(restriction, 'maxLength') or self._fetch_facet(restriction, 'length'),
+                'required': element.attrib.get('use') == 'required',
+                # Тип задан через xs:restriction, а не атрибутом type
+                'restricted': restriction is not None,
+            })
+
+        return field_types
+
+    @staticmethod
+    def _fetch_facet(restriction, facet):
+        if restriction is None:
+            return None
+        element = restriction.find(f"./xs:{facet}", {'xs': 'http://www.w3.org/2001/XMLSchema'})
+        if element is None:
+            return None
+        return int(element.attrib['value'])
+
     def _fetch_collection_tag(self):
         namespace = {'xs': 'http://www.w3.org/2001/XMLSchema'}
         element = self.tree.find("./xs:element[@name]", namespace)
@@ -115,8 +436,73 @@ class Definition:
 
         raise DefinitionError
 
+    def select(self, columns: list[str]) -> 'Definition':
+        """ Схема только с выбранными полями, порядок полей - как в XSD """
+        selected = [i for i, field in enumerate(self.table_fields) if field in columns]
+        meta = self.get_meta() | {
+            'table_fields': [self.table_fields[i] for i in selected],
+            'field_types': [self.field_types[i] for i in selected],
+        }
+        return Definition(self.title_name, self.source_file, meta)
+
+    def get_meta(self) -> dict:
+        return {
+            'collection_tag': self.collection_tag,
+            'entity_tag': self.entity_tag,
+            'table_fields': self.table_fields,
+            'field_types': self.field_types,
+        }
+
     def get_table_fields(self):
         return self.table_fields
 
+    def get_field_types(self):
+        return self.field_types
+
     def get_entity_tag(self):
         return self.entity_tag
+
+
+class DefinitionCache:
+    """ Кэш разобранных XSD схем.
+    В памяти процесса - по файлу схемы; на диске (если задан ``RA_CACHE_DIR``) - по пути, mtime и размеру файла,
+    так что повторные запуски и процессы-обработчики не разбирают XSD вовсе. """
+    VERSION = 2
+
+    _paths = {}
+    _meta = {}
+
+    @staticmethod
+    def get(title_name, schema_path, entity) -> Definition:
+        key = (schema_path, entity)
+        if key not in DefinitionCache._paths:
+            DefinitionCache._paths[key] = Common.get_source_filepath(schema_path, entity, 'xsd')
+        source_file = DefinitionCache._paths[key]
+
+        if source_file not in DefinitionCache._meta:
+            DefinitionCache._meta[source_file] = DefinitionCache._load(title_name, source_file)
+        return Definition(title_name, source_file, DefinitionCache._meta[source_file])
+
+    @staticmethod
+    def _load(title_name, source_file) -> dict:
+        cache_dir = os.environ.get("RA_CACHE_DIR")
+        if not cache_dir:
+            return Definition(title_name, source_file).get_meta()
+
+        size, mtime = Common.get_source_stat(source_file)
+        key = f'{DefinitionCache.VERSION}|{os.path.abspath(source_file)}|{mtime}|{size}'
+        cache_file = os.path.join(cache_dir, f'definition-{hashlib.sha1(key.encode()).hexdigest()}.json')
+        try:
+            with open(cache_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        meta = Definition(title_name, source_file).get_meta()
+        # Запись через временный файл: кэш могут одновременно заполнять несколько процессов
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_file = f'{cache_file}.{os.getpid()}.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(temp_file, cache_file)
+        return meta
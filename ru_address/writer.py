@@ -0,0 +1,324 @@
+import bz2
+import gzip
+import lzma
+import os
+import zlib
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from ru_address.errors import UnknownPlatformError
+
+# Текст кодируется частями по мере накопления, чтобы не держать в памяти блок дважды
+SEGMENT_SIZE = 1024 * 1024
+
+
+class CompressionRegistry:
+    """
+    Registered output compression codecs.
+    """
+    @staticmethod
+    def get_codec(alias: str):
+        available = CompressionRegistry.get_available_codecs()
+        return available.get(alias, None)
+
+    @staticmethod
+    def init_codec(alias: str):
+        _codec = CompressionRegistry.get_codec(alias)
+        if _codec is None:
+            raise UnknownPlatformError()
+        return _codec()
+
+    @staticmethod
+    def get_available_codecs() -> dict:
+        return {
+            'gzip': GzipCodec,
+            'bz2':  Bz2Codec,
+            'xz':   XzCodec,
+        }
+
+    @staticmethod
+    def get_available_codecs_list() -> list:
+        return list(CompressionRegistry.get_available_codecs().keys())
+
+
+class BaseCodec(ABC):
+    """ Сжатие блока в самостоятельный поток (member) формата;
+    склейка таких потоков - корректный файл, который распаковывается целиком стандартными утилитами. """
+    def __init__(self, default_level: int):
+        self.level = int(os.environ.get("RA_COMPRESS_LEVEL", default_level))
+
+    @staticmethod
+    @abstractmethod
+    def get_extension() -> str:
+        pass
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+
+class GzipCodec(BaseCodec):
+    """ Multi-member gzip, как у pigz """
+    def __init__(self):
+        BaseCodec.__init__(self, 6)
+
+    @staticmethod
+    def get_extension() -> str:
+        return 'gz'
+
+    def compress(self, data: bytes) -> bytes:
+        # mtime=0 - одинаковые данные дают одинаковый файл
+        return gzip.compress(data, self.level, mtime=0)
+
+
+class Bz2Codec(BaseCodec):
+    """ Multi-stream bzip2 """
+    def __init__(self):
+        BaseCodec.__init__(self, 9)
+
+    @staticmethod
+    def get_extension() -> str:
+        return 'bz2'
+
+    def compress(self, data: bytes) -> bytes:
+        return bz2.compress(data, self.level)
+
+
+class XzCodec(BaseCodec):
+    """ Multi-stream xz """
+    def __init__(self):
+        BaseCodec.__init__(self, 6)
+
+    @staticmethod
+    def get_extension() -> str:
+        return 'xz'
+
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, preset=self.level)
+
+
+class BlockWriter:
+    """ Запись дампа крупными блоками.
+    Текст копится в памяти, кодируется сегментами и сбрасывается на диск одним системным вызовом
+    при достижении размера блока (``RA_BLOCK_SIZE``, MiB). Опционально ``os.writev`` без склейки
+    сегментов (``RA_WRITEV``) и подсказки ядру ``posix_fadvise`` (``RA_FADVISE``).
+    При указании кодека блоки сжимаются независимо в пуле потоков (``RA_COMPRESS_THREADS``)
+    и пишутся в исходном порядке. С ``offset`` файл дописывается с этого смещения, хвост за ним отбрасывается.
+    С ``checksum`` по записываемым байтам считается CRC32 (для журнала ``--resume``, см. ``checkpoint``). """
+    def __init__(self, path: str, block_size: int | None = None, encoding: str = 'utf-8',
+                 codec: BaseCodec | None = None, threads: int | None = None, offset: int = 0,
+                 checksum: bool = False):
+        if block_size is None:
+            block_size = int(float(os.environ.get("RA_BLOCK_SIZE", "4")) * 1024 * 1024)
+        self.path = path
+        self.block_size = max(block_size, 1)
+        self.segment_size = min(self.block_size, SEGMENT_SIZE)
+        self.encoding = encoding
+        self.use_writev = os.environ.get("RA_WRITEV", "0") == "1" and hasattr(os, 'writev')
+        self.use_fadvise = os.environ.get("RA_FADVISE", "0") == "1" and hasattr(os, 'posix_fadvise')
+        self.codec = codec
+        if threads is None:
+            threads = int(os.environ.get("RA_COMPRESS_THREADS", os.cpu_count() or 1))
+        self.threads = max(threads, 1)
+        self.bytes_written = 0
+        self.flush_count = 0
+
+        self._pool = None
+        self._compressing = deque()
+        self._text = []
+        self._text_size = 0
+        self._chunks = []
+        self._chunks_size = 0
+        self._offset = offset
+        self._advised = offset
+        # CRC32 байтов, записанных после предыдущей контрольной точки
+        self._crc = 0 if checksum else None
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        self._fd = os.open(path, flags if offset else flags | os.O_TRUNC, 0o666)
+        if offset:
+            os.ftruncate(self._fd, offset)
+            os.lseek(self._fd, offset, os.SEEK_SET)
+        if self.use_fadvise:
+            os.posix_fadvise(self._fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+    def write(self, text: str):
+        self._text.append(text)
+        self._text_size += len(text)
+        if self._text_size >= self.segment_size:
+            self._seal()
+            if self._chunks_size >= self.block_size:
+                self.flush()
+
+    def write_bytes(self, data: bytes):
+        self._seal()
+        self._chunks.append(data)
+        self._chunks_size += len(data)
+        if self._chunks_size >= self.block_size:
+            self.flush()
+
+    def write_file(self, path: str):
+        """ Дописывает содержимое готового файла (например, части дампа) в обход буфера;
+        при сжатии файл должен быть сжат тем же кодеком """
+        self.flush()
+        self._drain()
+        with open(path, 'rb') as source:
+            size = os.fstat(source.fileno()).st_size
+            if self.use_fadvise:
+                os.posix_fadvise(source.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            # Копирование на стороне ядра минует CRC32
+            copied = 0 if self._crc is not None else self._copy_file_range(source.fileno(), size)
+            source.seek(copied)
+            while copied < size:
+                block = source.read(self.block_size)
+                if not block:
+                    break
+                self._write_all(block)
+                copied += len(block)
+        self.flush_count += 1
+        self._written(copied)
+
+    def flush(self):
+        self._seal()
+        if not self._chunks:
+            return
+        self.flush_count += 1
+        if self.codec is not None:
+            self._compress(b''.join(self._chunks))
+        elif self.use_writev and len(self._chunks) > 1:
+            self._writev(self._chunks)
+            self._written(self._chunks_size)
+        else:
+            self._write_all(self._chunks[0] if len(self._chunks) == 1 else b''.join(self._chunks))
+            self._written(self._chunks_size)
+        self._chunks = []
+        self._chunks_size = 0
+
+    def checkpoint(self) -> tuple[int, int | None]:
+        """ Сбрасывает все накопленное на диск (при сжатии - законченным фреймом), возвращает размер файла
+        и CRC32 байтов, записанных после предыдущей контрольной точки (None без ``checksum``) """
+        self.flush()
+        self._drain()
+        crc = self._crc
+        if crc is not None:
+            self._crc = 0
+        return self._offset + self.bytes_written, crc
+
+    def close(self):
+        self.flush()
+        self._drain()
+        if self._pool is not None:
+            self._pool.shutdown()
+        if self.use_fadvise:
+            os.posix_fadvise(self._fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        os.close(self._fd)
+
+    def _seal(self):
+        if not self._text:
+            return
+        text = ''.join(self._text)
+        if os.linesep != '\n':
+            # Поведение текстового режима open()
+            text = text.replace('\n', os.linesep)
+        chunk = text.encode(self.encoding)
+        self._chunks.append(chunk)
+        self._chunks_size += len(chunk)
+        self._text = []
+        self._text_size = 0
+
+    def _compress(self, data: bytes):
+        if self.threads == 1:
+            self._write_compressed(self.codec.compress(data))
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.threads)
+        self._compressing.append(self._pool.submit(self.codec.compress, data))
+        # Ограничиваем число блоков в памяти, пишем по готовности в исходном порядке
+        while len(self._compressing) > self.threads:
+            self._write_compressed(self._compressing.popleft().result())
+
+    def _drain(self):
+        while self._compressing:
+            self._write_compressed(self._compressing.popleft().result())
+
+    def _write_compressed(self, data: bytes):
+        self._write_all(data)
+        self._written(len(data))
+
+    def _written(self, size: int):
+        self.bytes_written += size
+        self._advise()
+
+    def _write_all(self, data):
+        if self._crc is not None:
+            self._crc = zlib.crc32(data, self._crc)
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+
+    def _writev(self, chunks):
+        limit = os.sysconf('SC_IOV_MAX') if hasattr(os, 'sysconf') else 1024
+        if self._crc is not None:
+            for chunk in chunks:
+                self._crc = zlib.crc32(chunk, self._crc)
+        pending = [memoryview(chunk) for chunk in chunks]
+        while pending:
+            written = os.writev(self._fd, pending[:limit])
+            while written:
+                if written >= len(pending[0]):
+                    written -= len(pending[0])
+                    pending.pop(0)
+                else:
+                    pending[0] = pending[0][written:]
+                    written = 0
+            while pending and not pending[0]:
+                pending.pop(0)
+
+    def _copy_file_range(self, source_fd, size):
+        if not hasattr(os, 'copy_file_range'):
+            return 0
+        copied = 0
+        try:
+            while copied < size:
+                count = os.copy_file_range(source_fd, self._fd, size - copied)
+                if count == 0:
+                    break
+                copied += count
+        except OSError:
+            # Файловая система не поддерживает копирование на стороне ядра, дописываем вручную
+            pass
+        return copied
+
+    def _advise(self):
+        # Уже записанные блоки не понадобятся, не засоряем ими page cache (с отставанием на один блок)
+        position = self._offset + self.bytes_written
+        if not self.use_fadvise or position - self._advised < 2 * self.block_size:
+            return
+        until = position - self.block_size
+        os.posix_fadvise(self._fd, self._advised, until - self._advised, os.POSIX_FADV_DONTNEED)
+        self._advised = until
+
+
+class ByteStream:
+    """ Файловый интерфейс поверх BlockWriter для библиотек, которые пишут в file-like объект """
+    def __init__(self, writer: BlockWriter):
+        self.writer = writer
+        self.closed = False
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.writer.write_bytes(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        # Файл закрывает владелец BlockWriter
+        self.closed = True
@@ -13,6 +13,11 @@ setup(
     license='MIT',
     packages=find_packages(),
     install_requires=["click", 'lxml', 'psutil'],
+    extras_require={
+        'parquet': ['pyarrow'],
+        'postgres': ['psycopg'],
+        'mysql': ['PyMySQL'],
+    },
     entry_points='''
        [console_scripts]
         ru_address=ru_address.command:cli